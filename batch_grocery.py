@@ -0,0 +1,106 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from grocery import format_grocery_list
+from recipe_core import check_plan
+
+# ======================================================================
+# BATCH GROCERY LISTS
+# ======================================================================
+# Builds the grocery lists for many meal plans at once, e.g. one per kitchen
+# for the week. Plans are resolved to recipe IDs and every recipe they use is
+# parsed once, up front, into the library's IngredientStore. That store is the
+# snapshot the worker processes share: each worker receives it once, when it
+# starts, and from then on only plans go out and finished lists come back.
+# The combined list for all plans is one more aggregation over the summed counts.
+
+COMBINED_NAME = "combined"
+_store = None  # the IngredientStore snapshot, in a worker process
+
+
+def read_plans(path):
+    """Reads a plans file: a JSON object of plan name -> {recipe title or ID: count}."""
+    with open(path, encoding="utf-8") as plans_file:
+        plans = json.load(plans_file)
+    if not isinstance(plans, dict):
+        raise ValueError(f"{path}: expected a JSON object of plan name -> {{recipe: count}}")
+    for name, plan in plans.items():
+        check_plan(plan, f"{path}, plan {name!r}")
+    return plans
+
+
+def _init_worker(store):
+    global _store
+    _store = store
+
+
+def _plan_list(job):
+    name, counts = job
+    return name, format_grocery_list(_store.aggregate(counts))
+
+
+def run_batch(library, plans, workers=None):
+    """
+    Builds a grocery list for every plan ({name: {recipe title or ID: count}}),
+    using a pool of `workers` processes (default: one per CPU; 1 runs in this
+    process). Returns (lists, combined, unknown): {plan name: list text}, the
+    list for all plans together, and {plan name: [keys that matched no recipe]}.
+    """
+    jobs = []
+    unknown = {}
+    combined_counts = {}
+    for name, plan in plans.items():
+        counts, missing = library.resolve_plan(plan)
+        if missing:
+            unknown[name] = missing
+        jobs.append((name, counts))
+        for recipe_id, count in counts.items():
+            combined_counts[recipe_id] = combined_counts.get(recipe_id, 0) + count
+    library.parse_ingredients(combined_counts)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) <= 1:
+        _init_worker(library.ingredients)
+        lists = dict(map(_plan_list, jobs))
+    else:
+        # A few chunks per worker keeps them all busy without a round trip per plan
+        chunksize = max(1, len(jobs) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(library.ingredients,)) as pool:
+            lists = dict(pool.map(_plan_list, jobs, chunksize=chunksize))
+    combined = format_grocery_list(library.ingredients.aggregate(combined_counts))
+    return lists, combined, unknown
+
+
+def list_filename(name, taken):
+    """A file name for a plan's list that is safe on every OS and not already in `taken`."""
+    stem = re.sub(r"[^\w\- ]+", "_", name).strip() or "plan"
+    candidate = stem
+    number = 1
+    while candidate.lower() in taken:
+        number += 1
+        candidate = f"{stem} ({number})"
+    taken.add(candidate.lower())
+    return candidate + ".txt"
+
+
+def write_text(path, text):
+    with open(path, "w", encoding="utf-8") as out_file:
+        out_file.write(text)
+
+
+def write_batch(directory, lists, combined):
+    """
+    Writes one file per plan plus combined.txt into directory.
+    Returns ({plan name: path}, path of the combined list).
+    """
+    os.makedirs(directory, exist_ok=True)
+    taken = {COMBINED_NAME}
+    paths = {name: os.path.join(directory, list_filename(name, taken)) for name in lists}
+    for name, path in paths.items():
+        write_text(path, lists[name])
+    combined_path = os.path.join(directory, COMBINED_NAME + ".txt")
+    write_text(combined_path, combined)
+    return paths, combined_path
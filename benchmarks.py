@@ -0,0 +1,601 @@
+"""
+Micro-benchmarks for the recipe data paths. Nothing here needs Google Sheets
+or a display; recipes are generated synthetically. Run e.g.:
+
+    python benchmarks.py grocery --recipes 5000 --selected 300
+    python benchmarks.py parser --strings 20000
+    python benchmarks.py startup --recipes 2000
+    python benchmarks.py search --recipes 50000
+    python benchmarks.py rows --recipes 10000
+    python benchmarks.py batch --recipes 5000 --plans 200 --workers 4
+    python benchmarks.py names --sizes 5000,20000,50000
+    python benchmarks.py scaling --sizes 1000,10000,100000 --backend fake
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from fractions import Fraction
+
+from recipe_index import RecipeIndex, TOTAL_COLUMNS
+from grocery import IngredientStore, format_grocery_list
+from ingredient_names import NameCanonicalizer, spelling
+from ingredient_parser import MEASUREMENT_OPTIONS, convert_to_fraction, parse_ingredient
+from quantity import DENOMINATOR
+from units import canonical_unit, display_amount
+from recipe_cache import RecipeCache
+from recipe_core import SUMMARY_COLUMNS, RecipeLibrary, fetch_sheet_rows, fetch_summaries, migrate_storage
+from search_index import SearchIndex, query_words, tokenize
+from storage import FakeSheetsStorage, SQLiteStorage
+from write_queue import APPEND, DELETE, WriteJournal, flush_writes
+
+# ======================================================================
+# SYNTHETIC DATA
+# ======================================================================
+SAMPLE_NAMES = [
+    "flour", "sugar", "butter", "eggs", "milk", "salt", "olive oil", "garlic",
+    "onion", "chickpeas", "rice", "tomatoes", "basil", "black pepper", "cumin",
+    "chicken thighs", "lemon juice", "baking soda", "honey", "vanilla extract",
+]
+SAMPLE_QUANTITIES = ["1", "2", "1/2", "3/4", "1 1/2", "2 1/4", "1/3", "4", ""]
+
+
+def synthetic_rows(count, seed=0):
+    """Returns a header row plus `count` fixed-width recipe rows, like get_all_values() would."""
+    rng = random.Random(seed)
+    units = [u for u in MEASUREMENT_OPTIONS if u.strip()] + [""]
+    rows = [["Title", "Author"] + [""] * (TOTAL_COLUMNS - 2)]
+    for i in range(count):
+        row = [""] * TOTAL_COLUMNS
+        row[0] = f"Recipe {i:06d}"
+        row[1] = f"Cook {rng.randrange(50)}"
+        for j in range(rng.randint(3, 15)):
+            row[2 + j] = f"{rng.choice(SAMPLE_QUANTITIES)} {rng.choice(units)} {rng.choice(SAMPLE_NAMES)}".strip()
+        row[TOTAL_COLUMNS - 2] = "Mix everything together and cook until done. " * rng.randint(1, 8)
+        rows.append(row)
+    return rows
+
+
+def best_time(fn, repeat=5):
+    """Runs fn `repeat` times and returns the fastest wall-clock time in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# ======================================================================
+# GROCERY AGGREGATION
+# ======================================================================
+def aggregate_by_reparsing(index, counts):
+    """The original generate_list path: parse every ingredient string on every click."""
+    grocery_list = defaultdict(lambda: defaultdict(Fraction))
+    for recipe_id, multiplier in counts.items():
+        for ing_str in index.get(recipe_id).ingredients:
+            qty_str, unit, name = parse_ingredient.__wrapped__(ing_str)
+            grocery_list[name.lower().strip()][unit] += convert_to_fraction(qty_str) * multiplier
+    return grocery_list
+
+
+def canonical_totals(grocery_list):
+    """
+    {name: {unit as written: Fraction}} -> {name: {display unit: amount in units}},
+    converting by hand with Fractions, for checking IngredientStore against.
+    """
+    by_dimension = defaultdict(Fraction)
+    for name, amounts in grocery_list.items():
+        for unit, total in amounts.items():
+            dimension, size = canonical_unit(unit)
+            by_dimension[name, dimension] += total * size * DENOMINATOR
+    converted = defaultdict(dict)
+    for (name, dimension), total in by_dimension.items():
+        if total:
+            total = total.numerator if total.denominator == 1 else total
+            unit, amount = display_amount(dimension, total)
+            converted[name][unit] = amount
+    return converted
+
+
+# Ingredient lines of one recipe -> the grocery list line they must print as (quantity, unit, name)
+GROCERY_CORPUS = [
+    (["1/2 Cup(s) Sugar"], ("1/2", "Cup(s)", "Sugar")),
+    (["1/3 Cup(s) Oil"], ("1/3", "Cup(s)", "Oil")),
+    (["2/3 Cup(s) Rice"], ("2/3", "Cup(s)", "Rice")),
+    (["1/2 Lb(s) Beef"], ("1/2", "Lb(s)", "Beef")),
+    (["4 Tsp(s) Salt"], ("1 1/3", "Tbsp(s)", "Salt")),
+    (["1 Tsp(s) Cumin"], ("1", "Tsp(s)", "Cumin")),
+    (["1 Tbsp(s) Butter", "3 tsp butter"], ("2", "Tbsp(s)", "Butter")),
+    (["6 Tbsp(s) Milk", "2 tbsp milk"], ("1/2", "Cup(s)", "Milk")),
+    (["1 Cup(s) Flour", "2 Tbsp(s) flour"], ("18", "Tbsp(s)", "Flour")),
+    (["12 Oz cheese", "1 Lb(s) cheese"], ("1 3/4", "Lb(s)", "Cheese")),
+    (["3 Cup(s) Flour", "1 Tsp(s) flour"], ("3 1/48", "Cup(s)", "Flour")),
+    (["2 Lb(s) Beef", "1 Oz beef"], ("2 1/16", "Lb(s)", "Beef")),
+    (["1500 g Potatoes"], ("1.5", "Kg", "Potatoes")),
+    (["1 Kg Rice", "100 g rice"], ("1.1", "Kg", "Rice")),
+    (["300 g Pasta"], ("300", "g", "Pasta")),
+    (["250 g Butter"], ("250", "g", "Butter")),
+    (["750 mL Milk"], ("750", "mL", "Milk")),
+    (["1/2 Tsp(s) Nutmeg"], ("1/2", "Tsp(s)", "Nutmeg")),
+]
+
+
+def check_grocery_corpus():
+    for ingredient_strings, (qty, unit, name) in GROCERY_CORPUS:
+        store = IngredientStore()
+        store.add_recipe(0, ingredient_strings)
+        expected = f"{qty.ljust(8)}{unit} {name}\n"
+        actual = format_grocery_list(store.aggregate({0: 1}))
+        if actual != expected:
+            raise SystemExit(f"{ingredient_strings}: expected {expected!r}, got {actual!r}")
+
+
+def bench_grocery(args):
+    check_grocery_corpus()
+    index = RecipeIndex.from_rows(synthetic_rows(args.recipes, args.seed))
+    rng = random.Random(args.seed)
+    chosen = rng.sample([recipe.recipe_id for recipe in index], min(args.selected, len(index)))
+    counts = {recipe_id: rng.randint(1, 3) for recipe_id in chosen}
+
+    build = best_time(lambda: IngredientStore.from_recipes(index), repeat=1)
+    store = IngredientStore.from_recipes(index)
+
+    by_spelling = aggregate_by_reparsing(index, counts)
+    expected = format_grocery_list(canonical_totals(by_spelling))
+    actual = format_grocery_list(store.aggregate(counts))
+    if expected != actual:
+        raise SystemExit("Columnar aggregation does not match the re-parsing path")
+
+    old = best_time(lambda: aggregate_by_reparsing(index, counts), args.repeat)
+    new = best_time(lambda: store.aggregate(counts), args.repeat)
+    print(f"{len(index)} recipes, {len(counts)} selected, "
+          f"{sum(map(len, by_spelling.values()))} unit spellings -> {actual.count(chr(10))} grocery lines")
+    print(f"  store build (once per load): {build * 1000:9.2f} ms")
+    print(f"  re-parse every click:        {old * 1000:9.2f} ms")
+    print(f"  columnar weighted sum:       {new * 1000:9.2f} ms  ({old / new:.0f}x faster)")
+
+
+# ======================================================================
+# INGREDIENT PARSER
+# ======================================================================
+# Expected (quantity, unit, name) for strings the parser must keep handling.
+PARSER_CORPUS = [
+    ("2 Cup(s) Flour", ("2", "Cup(s)", "Flour")),
+    ("1 1/2 Tbsp(s) sugar", ("1 1/2", "Tbsp(s)", "sugar")),
+    ("3/4 Tsp(s) baking soda", ("3/4", "Tsp(s)", "baking soda")),
+    ("2 cups milk", ("2", "cups", "milk")),
+    ("1 Tbsp olive oil", ("1", "Tbsp", "olive oil")),
+    ("1.5 Kg beef", ("1.5", "Kg", "beef")),
+    (".5 L water", (".5", "L", "water")),
+    ("250 mL milk", ("250", "mL", "milk")),
+    ("250g flour", ("250", "g", "flour")),
+    ("2 Lbs chicken thighs", ("2", "Lbs", "chicken thighs")),
+    ("½ Cup(s) oil", ("1/2", "Cup(s)", "oil")),
+    ("1½ cup oil", ("1 1/2", "cup", "oil")),
+    ("2 ¾ Oz cheese", ("2 3/4", "Oz", "cheese")),
+    ("3 ⁄ 4 tsp salt", ("3/4", "tsp", "salt")),
+    ("a Pinch of salt", ("1", "Pinch", "of salt")),
+    ("Dash hot sauce", ("1", "Dash", "hot sauce")),
+    ("4 Each eggs", ("4", "Each", "eggs")),
+    ("3 eggs", ("3", "Each", "eggs")),
+    ("1 1/2 eggs", ("1 1/2", "Each", "eggs")),
+    ("1 Large egg", ("1", "Each", "Large egg")),
+    ("Salt", ("1", "Each", "Salt")),
+    ("  Pinch  salt ", ("1", "Pinch", "salt")),
+    ("2 Lb(s)", ("2", "Lb(s)", "")),
+]
+
+
+def legacy_parse_ingredient(ingredient_str):
+    """The original per-unit regex loop, kept only as a baseline to time against."""
+    ingredient_str = ingredient_str.strip()
+    valid_units = [u for u in MEASUREMENT_OPTIONS if u.strip()]
+    sorted_units = sorted(valid_units, key=len, reverse=True)
+    found_unit = ""
+    for unit in sorted_units:
+        pattern = r'\b' + re.escape(unit.replace('(s)', '')) + r'(\(s\))?\b'
+        match = re.search(pattern, ingredient_str, re.IGNORECASE)
+        if match:
+            found_unit = match.group(0)
+            break
+    if found_unit:
+        parts = re.split(r'\b' + re.escape(found_unit) + r'\b', ingredient_str, maxsplit=1, flags=re.IGNORECASE)
+        return (parts[0].strip(), found_unit, parts[1].strip())
+    parts = ingredient_str.split(' ', 1)
+    if len(parts) > 1 and re.match(r'^[0-9./\s]+$', parts[0]):
+        return (parts[0].strip(), "Each", parts[1].strip())
+    return ("1", "Each", ingredient_str)
+
+
+def bench_parser(args):
+    failures = [(text, expected, parse_ingredient(text))
+                for text, expected in PARSER_CORPUS if parse_ingredient(text) != expected]
+    for text, expected, got in failures:
+        print(f"  MISMATCH {text!r}: expected {expected}, got {got}")
+    if failures:
+        raise SystemExit(f"{len(failures)} of {len(PARSER_CORPUS)} corpus strings parsed incorrectly")
+    print(f"corpus: {len(PARSER_CORPUS)} strings parsed correctly")
+
+    rows = synthetic_rows(args.strings // 8 + 1, args.seed)
+    strings = [ing for row in rows[1:] for ing in row[2:TOTAL_COLUMNS - 2] if ing][:args.strings]
+    # Make every string unique so the uncached timings measure real parsing work
+    strings = [f"{ing} #{i}" for i, ing in enumerate(strings)]
+
+    def run_all(parse):
+        for text in strings:
+            parse(text)
+
+    legacy = best_time(lambda: run_all(legacy_parse_ingredient), args.repeat)
+    compiled = best_time(lambda: run_all(parse_ingredient.__wrapped__), args.repeat)
+    run_all(parse_ingredient)
+    cached = best_time(lambda: run_all(parse_ingredient), args.repeat)
+    print(f"{len(strings)} ingredient strings")
+    print(f"  legacy per-unit loop:  {len(strings) / legacy:12,.0f} strings/s")
+    print(f"  compiled single pass:  {len(strings) / compiled:12,.0f} strings/s")
+    print(f"  memoized (warm cache): {len(strings) / cached:12,.0f} strings/s")
+
+
+# ======================================================================
+# CLI COLD START
+# ======================================================================
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def bench_startup(args):
+    from recipe_cli import STARTUP_BUDGET_MS
+
+    # Importing the core must not pull in the GUI or the Google client libraries
+    probe = subprocess.run(
+        [sys.executable, "-c", "import sys, recipe_core; "
+         "print(','.join(m for m in ('tkinter', 'gspread', 'oauth2client') if m in sys.modules))"],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    if probe.stdout.strip():
+        raise SystemExit(f"recipe_core imports heavy modules eagerly: {probe.stdout.strip()}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "cache.sqlite3")
+        rows = synthetic_rows(args.recipes, args.seed)
+        cache = RecipeCache(cache_path)
+        cache.replace_rows(rows, "benchmark")
+        cache.close()
+        plan_path = os.path.join(tmp, "plan.json")
+        with open(plan_path, "w", encoding="utf-8") as plan_file:
+            json.dump({row[0]: 1 + i % 3 for i, row in enumerate(rows[1:50])}, plan_file)
+
+        command = [sys.executable, os.path.join(HERE, "recipe_cli.py"), "--cache", cache_path,
+                   "grocery", "--plan", plan_path, "--output", os.devnull]
+        cold = best_time(lambda: subprocess.run(command, check=True), args.repeat)
+
+    print(f"CLI grocery list from a {args.recipes}-recipe cache")
+    print(f"  cold start to output: {cold * 1000:8.1f} ms (budget {STARTUP_BUDGET_MS} ms)")
+    if cold * 1000 > STARTUP_BUDGET_MS:
+        raise SystemExit("over the cold start budget")
+
+
+# ======================================================================
+# FULL-TEXT SEARCH
+# ======================================================================
+TITLE_ADJECTIVES = ["Spicy", "Creamy", "Quick", "Roasted", "Smoky", "Lemony", "Crispy", "Slow Cooker", "Easy"]
+TITLE_DISHES = ["Curry", "Stew", "Salad", "Soup", "Bake", "Tacos", "Pasta", "Bowl", "Bread", "Pie"]
+QUERIES = ["chickpea curry", "garlic", "ch", "cook 12", "creamy chicken soup", "xyzzy", "c"]
+
+
+def searchable_rows(count, seed=0):
+    """synthetic_rows() with word-y titles and instructions drawn from a few thousand distinct words."""
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(5000)]
+    rows = synthetic_rows(count, seed)
+    for row in rows[1:]:
+        row[0] = f"{rng.choice(TITLE_ADJECTIVES)} {rng.choice(SAMPLE_NAMES).title()} {rng.choice(TITLE_DISHES)}"
+        row[TOTAL_COLUMNS - 2] = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(20, 80)))
+    return rows
+
+
+def search_by_scanning(index, query):
+    """Reference matcher: every query word must start a word somewhere in the recipe."""
+    words = query_words(query)
+    matches = set()
+    for recipe in index:
+        text = [recipe.title, recipe.author, recipe.instructions]
+        text += [parse_ingredient(ing)[2] for ing in recipe.ingredients]
+        recipe_words = set(tokenize(" ".join(text)))
+        if words and all(any(indexed.startswith(word) for indexed in recipe_words) for word in words):
+            matches.add(recipe.recipe_id)
+    return matches
+
+
+def bench_search(args):
+    index = RecipeIndex.from_rows(searchable_rows(args.recipes, args.seed))
+    start = time.perf_counter()
+    search = SearchIndex.from_recipes(index)
+    build = time.perf_counter() - start
+    print(f"{len(index)} recipes, {len(search.vocabulary)} distinct words")
+    print(f"  index build (once per load): {build * 1000:9.1f} ms")
+
+    # Rebuild per check so every query is answered from scratch, not narrowed from the previous one
+    checked = RecipeIndex.from_rows(searchable_rows(min(args.recipes, 2000), args.seed))
+    for query in QUERIES:
+        expected = search_by_scanning(checked, query)
+        if set(SearchIndex.from_recipes(checked).search(query)) != expected:
+            raise SystemExit(f"search results differ from a full scan for {query!r}")
+
+    print(f"  {'query':<22} {'fresh':>10} {'matches':>9}")
+    for query in QUERIES:
+        def fresh():
+            search._last_query = None
+            return search.search(query)
+        print(f"  {query!r:<22} {best_time(fresh, args.repeat) * 1000:>7.2f} ms {len(fresh()):>9,}")
+
+    # Type-ahead: one search per keystroke, each narrowing the previous results
+    for query in QUERIES[:1] + QUERIES[4:5]:
+        search._last_query = None
+        slowest = 0.0
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            search.search(query[:end])
+            slowest = max(slowest, time.perf_counter() - start)
+        print(f"  typing {query!r}: slowest keystroke {slowest * 1000:.2f} ms")
+
+
+# ======================================================================
+# BATCH GROCERY LISTS
+# ======================================================================
+def bench_batch(args):
+    from batch_grocery import run_batch
+
+    rows = synthetic_rows(args.recipes, args.seed)
+    rng = random.Random(args.seed)
+    titles = [row[0] for row in rows[1:]]
+    plans = {f"Kitchen {i}": {title: rng.randint(1, 4) for title in rng.sample(titles, min(args.per_plan, len(titles)))}
+             for i in range(args.plans)}
+
+    results = {}
+    print(f"{args.plans} plans of {args.per_plan} recipes over {args.recipes} recipes")
+    for workers in sorted({1, args.workers}):
+        library = RecipeLibrary.from_rows(rows, preparse=False)
+        start = time.perf_counter()
+        results[workers] = run_batch(library, plans, workers)
+        elapsed = time.perf_counter() - start
+        print(f"  {workers} worker(s): {elapsed * 1000:9.1f} ms  ({args.plans / elapsed:8.1f} plans/s)")
+    if results[1] != results[args.workers]:
+        raise SystemExit("the worker pool produced different lists")
+
+
+# ======================================================================
+# INGREDIENT NAME MERGING
+# ======================================================================
+def one_edit_spellings(word):
+    """Every string one_edit_apart() would accept for a lowercase word."""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    spellings = {word[:i] + word[i + 1:] for i in range(1, len(word))}
+    spellings |= {word[:i] + c + word[i:] for i in range(1, len(word) + 1) for c in letters}
+    spellings |= {word[:i] + word[i + 1] + word[i] + word[i + 2:] for i in range(len(word) - 1)}
+    return spellings
+
+
+def name_variants(count, seed=0):
+    """
+    About `count` distinct ingredient strings: made-up names of one to three
+    words, then a plural, a reordered and a misspelled variant of each.
+    Returns ([names, correctly spelled first], {name: the name it should merge with}).
+    """
+    rng = random.Random(seed)
+    syllables = [c + v for c in "bdfgklmnprt" for v in "aeiou"]
+    vocabulary = list({"".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) + rng.choice("bdfgklmnprt")
+                       for _ in range(max(100, count // 8))})
+    known = set(vocabulary)
+    # Keyed on the set of words: the same words in another order are the same name
+    bases = list({frozenset(words): " ".join(words)
+                  for words in (rng.sample(vocabulary, rng.randint(1, 3)) for _ in range(count // 4))}.values())
+    variants = {}
+    for base in bases:
+        words = base.split()
+        variants[" ".join(words[:-1] + [words[-1] + "s"])] = base
+        if len(words) > 1:
+            variants[f"{words[-1]}, {' '.join(words[:-1])}"] = base
+        # A dropped (never the first), doubled or swapped letter in one word long enough to be checked for typos
+        long_words = [i for i, word in enumerate(words) if len(word) >= 6]
+        if long_words:
+            i = rng.choice(long_words)
+            word = words[i]
+            at = rng.randrange(len(word) - 1)
+            typo = rng.choice([word[:at + 1] + word[at + 2:], word[:at] + word[at] + word[at:],
+                               word[:at] + word[at + 1] + word[at] + word[at + 2:]])
+            # Skip a typo that is just as close to some other word: either reading would be right
+            if not any(other in known and other != word for other in one_edit_spellings(typo)):
+                variants[" ".join(words[:i] + [typo] + words[i + 1:])] = base
+    typos = [name for name in variants if name not in bases]
+    rng.shuffle(typos)
+    return bases + typos, {name: variants.get(name, name) for name in bases + typos}
+
+
+def bench_names(args):
+    print(f"  {'names':>8} {'merged into':>12} {'build':>10} {'per name':>10}")
+    for size in map(int, args.sizes.split(",")):
+        names, expected = name_variants(size, args.seed)
+        canon = NameCanonicalizer()
+        start = time.perf_counter()
+        ids = {name: canon.canonical(name) for name in names}
+        build = time.perf_counter() - start
+        wrong = [name for name in names if ids[name] != ids[expected[name]]]
+        if wrong:
+            raise SystemExit(f"{len(wrong)} variants were not merged, e.g. {wrong[0]!r} -> {expected[wrong[0]]!r}")
+        if len(canon) != len(set(expected.values())):
+            raise SystemExit(f"{len(set(expected.values()))} names were merged into {len(canon)}")
+        # Once the proper spelling is the most used, it is the one shown, even if a typo came first
+        for name in names:
+            canon.use(spelling(name))
+        for base in set(expected.values()):
+            canon.use(spelling(base))
+        shown = {name for name in canon.names}
+        if shown != set(expected.values()):
+            raise SystemExit(f"{len(shown - set(expected.values()))} names are shown with a variant spelling")
+        print(f"  {len(names):>8,} {len(canon):>12,} {build * 1000:>7.1f} ms {build / len(names) * 1e6:>7.2f} us")
+
+
+# ======================================================================
+# ROW LAYOUTS
+# ======================================================================
+def bench_rows(args):
+    legacy = synthetic_rows(args.recipes, args.seed)
+    storage = FakeSheetsStorage(legacy)
+    converted = migrate_storage(storage)
+    compact = storage.get_all_rows()
+
+    # Both layouts (and a sheet half-way through a migration) must load the same recipes
+    mixed = compact[:len(compact) // 2] + legacy[len(legacy) // 2:]
+    expected = {(r.recipe_id, tuple(r.ingredients), r.instructions) for r in RecipeIndex.from_rows(legacy)}
+    for rows in (compact, mixed):
+        if {(r.recipe_id, tuple(r.ingredients), r.instructions) for r in RecipeIndex.from_rows(rows)} != expected:
+            raise SystemExit("the compact layout loads different recipes")
+    if fetch_summaries(FakeSheetsStorage(mixed), None)[0] != fetch_summaries(storage, None)[0]:
+        raise SystemExit("summaries differ between layouts")
+
+    print(f"{args.recipes} recipes, {converted} rows converted")
+    print(f"  {'layout':<8} {'cells':>10} {'bytes':>12} {'summary bytes':>14} {'index build':>14}")
+    for name, rows in (("legacy", legacy), ("compact", compact)):
+        cells = sum(len(row) for row in rows)
+        size = len(json.dumps(rows, ensure_ascii=False))
+        summary = len(json.dumps(FakeSheetsStorage(rows).get_columns(SUMMARY_COLUMNS), ensure_ascii=False))
+        build = best_time(lambda: RecipeIndex.from_rows(rows), args.repeat)
+        print(f"  {name:<8} {cells:>10,} {size:>12,} {summary:>14,} {build * 1000:>11.1f} ms")
+
+
+# ======================================================================
+# SCALING SUITE
+# ======================================================================
+def seed_storage(backend, rows, tmp, latency):
+    """Returns a storage backend pre-loaded with rows."""
+    if backend == "fake":
+        return FakeSheetsStorage(rows, latency=latency)
+    storage = SQLiteStorage(os.path.join(tmp, f"bench-{len(rows)}.sqlite3"))
+    with storage.conn:
+        storage.conn.executemany("INSERT INTO sheet (row_number, cells) VALUES (?, ?)",
+                                 [(i + 1, json.dumps(row)) for i, row in enumerate(rows)])
+    return storage
+
+
+def time_per_op(ops):
+    """Runs each zero-argument callable once and returns the mean time per call in seconds."""
+    start = time.perf_counter()
+    for op in ops:
+        op()
+    return (time.perf_counter() - start) / max(len(ops), 1)
+
+
+def bench_scaling(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    print(f"backend={args.backend} latency={args.latency_ms} ms; refresh and flush are one run, "
+          f"the rest are per-operation means")
+    print(f"{'recipes':>9} {'refresh':>12} {'select':>12} {'submit':>12} {'delete':>12} {'grocery':>12} "
+          f"{'batch flush':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            rng = random.Random(args.seed)
+            rows = synthetic_rows(size, args.seed)
+            storage = seed_storage(args.backend, rows, tmp, args.latency_ms / 1000)
+
+            library = None
+            def refresh():
+                nonlocal library
+                fetched_rows, _ = fetch_sheet_rows(storage, None)
+                library = RecipeLibrary.from_rows(fetched_rows)
+            refresh_time = best_time(refresh, repeat=1)
+
+            ids = [recipe.recipe_id for recipe in library.index]
+            select_time = time_per_op([lambda rid=rid: library.index.get(rid) for rid in rng.choices(ids, k=1000)])
+
+            # Submits and deletes as the app does them: applied locally and journaled for the next flush
+            journal = WriteJournal(os.path.join(tmp, f"journal-{size}.sqlite3"))
+            new_rows = synthetic_rows(args.ops, args.seed + 1)[1:]
+            for row in new_rows:
+                row[0] = "New " + row[0]
+            def submit(row):
+                library.add_row(row)
+                journal.add(APPEND, row)
+            submit_time = time_per_op([lambda row=row: submit(row) for row in new_rows])
+
+            def delete():
+                recipe = library.index.get(rng.choice(ids))
+                while recipe is None:
+                    recipe = library.index.get(rng.choice(ids))
+                nth = library.index.occurrence(recipe.recipe_id)
+                library.remove(recipe.recipe_id)
+                journal.add(DELETE, recipe.to_row(), nth)
+            delete_time = time_per_op([delete] * args.ops)
+
+            live_ids = [recipe.recipe_id for recipe in library.index]
+            counts = {rid: rng.randint(1, 3) for rid in rng.sample(live_ids, min(100, len(live_ids)))}
+            grocery_time = best_time(lambda: library.grocery_list_text(counts), args.repeat)
+
+            # Those submits and deletes reaching the backend as one batch
+            writes = journal.pending()
+            flush_time = best_time(lambda: flush_writes(storage, rows, storage.get_revision(), writes), repeat=1)
+            journal.close()
+
+            print(f"{size:>9,} {refresh_time * 1000:>9.1f} ms {select_time * 1e6:>9.2f} us "
+                  f"{submit_time * 1000:>9.3f} ms {delete_time * 1000:>9.3f} ms {grocery_time * 1000:>9.2f} ms "
+                  f"{flush_time * 1000:>9.2f} ms")
+            if isinstance(storage, SQLiteStorage):
+                storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recipe Indexer micro-benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+
+    grocery = sub.add_parser("grocery", help="grocery list aggregation")
+    grocery.add_argument("--recipes", type=int, default=5000)
+    grocery.add_argument("--selected", type=int, default=300)
+    grocery.set_defaults(func=bench_grocery)
+
+    parser_bench = sub.add_parser("parser", help="ingredient string parsing")
+    parser_bench.add_argument("--strings", type=int, default=20000)
+    parser_bench.set_defaults(func=bench_parser)
+
+    startup = sub.add_parser("startup", help="CLI cold start to first output")
+    startup.add_argument("--recipes", type=int, default=2000)
+    startup.set_defaults(func=bench_startup)
+
+    search = sub.add_parser("search", help="full-text search queries and type-ahead")
+    search.add_argument("--recipes", type=int, default=50000)
+    search.set_defaults(func=bench_search)
+
+    batch = sub.add_parser("batch", help="many meal plans at once, in-process vs a worker pool")
+    batch.add_argument("--recipes", type=int, default=5000)
+    batch.add_argument("--plans", type=int, default=200)
+    batch.add_argument("--per-plan", type=int, default=40, help="recipes per plan")
+    batch.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    batch.set_defaults(func=bench_batch)
+
+    names = sub.add_parser("names", help="merging ingredient name spellings")
+    names.add_argument("--sizes", default="5000,20000,50000", help="comma-separated distinct name counts")
+    names.set_defaults(func=bench_names)
+
+    rows = sub.add_parser("rows", help="legacy vs compact row layout")
+    rows.add_argument("--recipes", type=int, default=10000)
+    rows.set_defaults(func=bench_rows)
+
+    scaling = sub.add_parser("scaling", help="refresh/select/submit/delete/grocery against a seeded backend")
+    scaling.add_argument("--sizes", default="1000,10000,100000", help="comma-separated recipe counts")
+    scaling.add_argument("--backend", choices=["fake", "sqlite"], default="fake")
+    scaling.add_argument("--latency-ms", type=float, default=0.0, help="fake backend delay per API call")
+    scaling.add_argument("--ops", type=int, default=20, help="submits and deletes to time per size")
+    scaling.set_defaults(func=bench_scaling)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
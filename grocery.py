@@ -0,0 +1,158 @@
+from array import array
+from collections import defaultdict
+
+import profiling
+from ingredient_names import NameCanonicalizer, spelling
+from ingredient_parser import parse_ingredient
+from quantity import add_scaled, to_units
+from units import canonical_unit, display_amount, format_amount
+
+# ======================================================================
+# COLUMNAR INGREDIENT STORE
+# ======================================================================
+# Each recipe's ingredients are parsed once, when the recipe is loaded, into
+# two parallel integer arrays: the grocery list line each ingredient adds to
+# (a dense ID per canonical name and unit dimension) and its quantity in
+# fixed-denominator units (see quantity.py) of the dimension's base unit (see
+# units.py), so "1 Cup" and "2 tbsp" of flour land on the same line. Building a
+# grocery list is then a weighted integer sum of those arrays into one total
+# per line, with each total converted to a display unit once at the end.
+# Names are resolved by a NameCanonicalizer (see ingredient_names.py) as each
+# recipe is added, so "eggs" and "egg" share a line too.
+
+INT64_LIMIT = 1 << 62  # keeps count * amount comfortably inside a signed 64-bit slot
+
+
+class RecipeVector:
+    """
+    One recipe's pre-parsed ingredients, with repeated lines already summed.
+    extras holds the rare (line, amount) whose amount isn't a whole number of units.
+    """
+    __slots__ = ("lines", "amounts", "extras")
+
+    def __init__(self, lines, amounts, extras=()):
+        self.lines = lines
+        self.amounts = amounts
+        self.extras = extras
+
+
+class IngredientStore:
+    """Interned ingredient names/dimensions/lines and a RecipeVector for every loaded recipe."""
+
+    def __init__(self):
+        self.names = NameCanonicalizer()
+        self.dimensions = []
+        self.dimension_ids = {}
+        self.lines = []  # line ID -> (name ID, dimension ID)
+        self.line_ids = {}
+        self.vectors = {}  # recipe ID -> RecipeVector
+        self.spellings = {}  # recipe ID -> the ingredient names it uses, counted once each in self.names
+
+    @classmethod
+    def from_recipes(cls, recipes):
+        """Builds a store for an iterable of Recipe records."""
+        store = cls()
+        for recipe in recipes:
+            store.add_recipe(recipe.recipe_id, recipe.ingredients)
+        return store
+
+    def _intern(self, value, values, ids):
+        found = ids.get(value)
+        if found is None:
+            found = ids[value] = len(values)
+            values.append(value)
+        return found
+
+    def add_recipe(self, recipe_id, ingredient_strings):
+        """Parses a recipe's ingredient strings and stores them as a RecipeVector."""
+        self._uncount_names(recipe_id)  # Re-added with its details filled in
+        summed = {}
+        spellings = set()
+        for ing_str in ingredient_strings:
+            if not ing_str.strip():
+                continue
+            qty_str, unit, name = parse_ingredient(ing_str)
+            dimension, size = canonical_unit(unit)
+            amount = to_units(qty_str) * size
+            if not abs(amount) < INT64_LIMIT:
+                continue  # Not a real kitchen quantity; leave it out rather than overflow
+            name = spelling(name)
+            name_id = self.names.canonical(name)
+            spellings.add(name)
+            dimension_id = self._intern(dimension, self.dimensions, self.dimension_ids)
+            line = self._intern((name_id, dimension_id), self.lines, self.line_ids)
+            summed[line] = summed.get(line, 0) + amount
+
+        whole = {line: amount for line, amount in summed.items() if isinstance(amount, int)}
+        self.vectors[recipe_id] = RecipeVector(
+            array('q', whole),
+            array('q', whole.values()),
+            tuple((line, amount) for line, amount in summed.items() if line not in whole),
+        )
+        for name in spellings:
+            self.names.use(name)
+        self.spellings[recipe_id] = spellings
+
+    def remove_recipe(self, recipe_id):
+        """Forgets a deleted recipe. Interned names, dimensions and lines are kept for reuse."""
+        self.vectors.pop(recipe_id, None)
+        self._uncount_names(recipe_id)
+
+    def _uncount_names(self, recipe_id):
+        for name in self.spellings.pop(recipe_id, ()):
+            self.names.use(name, -1)
+
+    @profiling.timed("grocery.aggregate")
+    def aggregate(self, counts):
+        """
+        Sums the ingredients of the given recipes, weighted by their counts.
+        counts maps recipe ID -> number of times the recipe is being made.
+        Returns {ingredient name: {display unit: amount in units}}.
+        """
+        totals = [0] * len(self.lines)
+        for recipe_id, count in counts.items():
+            vector = self.vectors.get(recipe_id)
+            if vector is None or count <= 0:
+                continue
+            add_scaled(totals, vector.lines, vector.amounts, count)
+            for line, amount in vector.extras:
+                totals[line] += amount * count
+
+        grocery_list = defaultdict(dict)
+        for line, total in enumerate(totals):
+            if total:
+                name_id, dimension_id = self.lines[line]
+                unit, amount = display_amount(self.dimensions[dimension_id], total)
+                grocery_list[self.names.names[name_id]][unit] = amount
+        return grocery_list
+
+# ======================================================================
+# GROCERY LIST FORMATTING
+# ======================================================================
+@profiling.timed("grocery.format")
+def format_grocery_list(grocery_list):
+    """Turns {name: {unit: amount in units}} into the aligned, alphabetical text shown to the user."""
+    # Create a list of formatted strings to be sorted
+    output_lines = []
+    for name, amounts in grocery_list.items():
+        for unit, total_quantity in amounts.items():
+            if total_quantity > 0:
+                # Format the parts of the line
+                qty_str = format_amount(unit, total_quantity)
+                unit_str = unit if unit != "Each" else ""
+                # Capitalize the ingredient name for display
+                name_str = name.capitalize()
+
+                # Add to a list of tuples for sorting: (name, qty, unit)
+                output_lines.append((name_str, qty_str, unit_str))
+
+    # Sort the list alphabetically by the ingredient name, then unit (the first and last items in the tuple)
+    output_lines.sort(key=lambda x: (x[0], x[2]))
+
+    # Build the final display text with clean alignment
+    display_text = ""
+    for name_str, qty_str, unit_str in output_lines:
+        # Use ljust to left-align the quantity in a fixed-width column
+        aligned_qty = qty_str.ljust(8)
+        display_text += f"{aligned_qty}{unit_str} {name_str}\n"
+    return display_text
@@ -0,0 +1,173 @@
+import re
+from itertools import product
+
+# ======================================================================
+# INGREDIENT NAME CANONICALIZATION
+# ======================================================================
+# Grocery lines used to be keyed by the lowercased name, so "egg" and "eggs",
+# "all-purpose flour" and "flour, all purpose", or "chicken" and "chiken" came
+# out as separate lines. A name is now reduced to a key: its words singularized,
+# minus stop words and descriptors, with typos mapped onto a word already seen,
+# then sorted. Names with the same key share a line.
+#
+# Typos are matched a word at a time, so the fuzzy part only ever compares
+# words, and there are far fewer distinct words than distinct names. Each new
+# word is looked up in a trigram index of the words seen so far; a candidate
+# has to share all but a few trigrams and then be exactly one inserted, dropped
+# or swapped letter away. Substitutions are deliberately not accepted: they are
+# how most real pairs of different ingredients differ (butter/batter,
+# potato/tomato), and neither is a first letter added or dropped (ground/round).
+# Every name and word is resolved once and cached, so the cost of loading grows
+# with the number of distinct words, not pairs of names.
+#
+# A merged name is shown as the spelling the most recipes use, so a typo that
+# happened to be loaded first doesn't end up on everyone's grocery list. Uses
+# are counted by the caller (see IngredientStore), once per recipe, and taken
+# back when the recipe goes.
+
+STOP_WORDS = frozenset(
+    "a an and or of the to for with fresh large small medium chopped diced minced sliced optional taste".split()
+)
+MIN_FUZZY_LENGTH = 5  # shorter words must match exactly; one letter is too much of them
+MAX_TRIGRAMS_LOST = 4  # a swap of two letters breaks up to four trigrams, an inserted or dropped one three
+
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+def spelling(name):
+    """A name as written, as far as telling spellings apart goes."""
+    return name.lower().strip()
+
+
+def singular(word):
+    """A rough singular for grouping: eggs -> egg, tomatoes -> tomato, berries -> berry."""
+    if len(word) <= 3 or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes", "zes")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def one_edit_apart(a, b):
+    """
+    True if a and b differ by exactly one inserted/dropped letter (not the first)
+    or one swap of neighbours.
+    """
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) != 2:
+            return False
+        i, j = diffs
+        return j == i + 1 and a[i] == b[j] and a[j] == b[i]
+    if abs(len(a) - len(b)) != 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return i > 0 and a[i:] == b[i + 1:]
+
+
+class NameCanonicalizer:
+    """
+    Maps ingredient names to canonical name IDs, learning as it goes. names[ID]
+    is how a canonical name is shown: its most used spelling (the first one seen
+    on a tie), going by use().
+    """
+
+    def __init__(self):
+        self.names = []         # canonical name ID -> display name
+        self.spellings = []     # canonical name ID -> its spellings, first seen first
+        self.by_name = {}       # spelling -> canonical name ID
+        self.uses = {}          # spelling -> uses counted by use()
+        self.by_key = {}        # tuple of canonical words -> canonical name ID
+        self.words = {}         # word as normalized -> canonical word
+        self.word_grams = {}    # canonical word -> its trigrams
+        self.postings = {}      # (0 or -1, first or last letter, length, trigram) -> canonical words
+
+    def __len__(self):
+        return len(self.names)
+
+    def canonical(self, name):
+        """The canonical name ID for an ingredient name."""
+        name = spelling(name)
+        name_id = self.by_name.get(name)
+        if name_id is None:
+            key = self.name_key(name)
+            name_id = self.by_key.get(key)
+            if name_id is None:
+                name_id = self.by_key[key] = len(self.names)
+                self.names.append(name)
+                self.spellings.append([])
+            self.by_name[name] = name_id
+            self.uses[name] = 0
+            self.spellings[name_id].append(name)
+        return name_id
+
+    def use(self, name, count=1):
+        """Counts `count` more (or, if negative, fewer) uses of a spelling() canonical() has seen."""
+        name_id = self.by_name[name]
+        uses = self.uses[name] = self.uses[name] + count
+        shown = self.names[name_id]
+        if name != shown:
+            if uses > self.uses[shown]:
+                self.names[name_id] = name
+        elif count < 0:
+            # Only the shown spelling losing uses can make another one the most used
+            self.names[name_id] = max(self.spellings[name_id], key=self.uses.__getitem__)
+
+    def name_key(self, name):
+        """The canonical words of a name, sorted so word order doesn't matter."""
+        words = [singular(word) for word in _WORD.findall(name) if word not in STOP_WORDS]
+        if not words:
+            return (name,)
+        return tuple(sorted(set(map(self.canonical_word, words))))
+
+    def canonical_word(self, word):
+        found = self.words.get(word)
+        if found is None:
+            found = self.words[word] = self._similar_word(word) or self._add_word(word)
+        return found
+
+    def _add_word(self, word):
+        grams = self.word_grams[word] = trigrams(word)
+        for gram in grams:
+            for end in (0, -1):
+                self.postings.setdefault((end, word[end], len(word), gram), []).append(word)
+        return word
+
+    def _similar_word(self, word):
+        """A known word this one is a typo of, or None."""
+        if len(word) < MIN_FUZZY_LENGTH:
+            return None
+        grams = trigrams(word)
+        best = None
+        best_shared = 0
+        checked = set()  # a candidate is listed under several trigrams, and maybe under both ends
+        # One edit can't change both the first and the last letter of a word this long,
+        # so a match is listed under the same first letter or the same last letter
+        for end, length in product((0, -1), range(max(len(word) - 1, MIN_FUZZY_LENGTH), len(word) + 2)):
+            # A word one edit away lacks at most MAX_TRIGRAMS_LOST of these trigrams, so
+            # it has to be listed under one of the rarest MAX_TRIGRAMS_LOST + 1; the
+            # common ones, with the longest lists, never need to be read.
+            postings = sorted((self.postings.get((end, word[end], length, gram), ()) for gram in grams), key=len)
+            for candidates in postings[:MAX_TRIGRAMS_LOST + 1]:
+                for candidate in candidates:
+                    if candidate in checked:
+                        continue
+                    checked.add(candidate)
+                    if one_edit_apart(word, candidate):
+                        shared = len(grams & self.word_grams[candidate])
+                        if shared > best_shared:
+                            best, best_shared = candidate, shared
+        return best
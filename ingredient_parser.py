@@ -0,0 +1,103 @@
+import re
+from fractions import Fraction
+from functools import lru_cache
+
+import profiling
+
+# ======================================================================
+# INGREDIENT PARSER
+# ======================================================================
+# Splits strings like "1 1/2 Cup(s) Flour" into (quantity, unit, name) with a
+# single precompiled regex. Results are memoized, since the same ingredient
+# strings come up again and again across recipes and refreshes.
+
+MEASUREMENT_OPTIONS = [
+    " ", "Cup(s)", "Tsp(s)", "Tbsp(s)", "Oz", "Lb(s)", "g", "Kg",
+    "mL", "L", "Each", "Pinch", "Dash"
+]
+
+UNICODE_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4",
+    "⅕": "1/5", "⅖": "2/5", "⅗": "3/5", "⅘": "4/5", "⅙": "1/6",
+    "⅚": "5/6", "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+WORD_QUANTITIES = {"a": "1", "an": "1"}
+PARSE_CACHE_SIZE = 65536
+
+
+def _unit_alternation():
+    """Builds the unit part of the pattern from MEASUREMENT_OPTIONS, longest first."""
+    branches = []
+    for unit in sorted((u.strip() for u in MEASUREMENT_OPTIONS if u.strip()), key=len, reverse=True):
+        base = re.escape(unit.replace('(s)', ''))
+        # Accept "Cup", "Cup(s)" and "Cups"; single letters like "g" or "L" only take "(s)"
+        plural = r'(?:\(s\)|e?s)?' if len(base) > 1 else r'(?:\(s\))?'
+        branches.append(base + plural)
+    return '|'.join(branches)
+
+
+_FRACTION_CHARS = ''.join(UNICODE_FRACTIONS)
+_QUANTITY = rf"""
+    \d+\s*[{_FRACTION_CHARS}]            # 1½
+  | \d+\s+\d+\s*[/⁄]\s*\d+              # 1 1/2
+  | \d+\s*[/⁄]\s*\d+                    # 3/4
+  | \d*\.\d+ | \d+                      # 1.5, .5, 2
+  | [{_FRACTION_CHARS}]                 # ½
+"""
+
+INGREDIENT_PATTERN = re.compile(
+    rf"""
+    ^\s*(?:
+        # A known unit anywhere in the string (the leftmost one wins). Digits may touch it ("250g").
+        (?P<before>.*?) (?<![^\W\d_]) (?P<unit>{_unit_alternation()}) (?!\w) (?P<after>.*?)
+      | # No unit: a leading quantity followed by the name
+        (?P<qty>{_QUANTITY}) \s+ (?P<name>.+?)
+      | # Nothing recognisable: the whole string is the name
+        (?P<bare>.*?)
+    )\s*$
+    """,
+    re.IGNORECASE | re.VERBOSE | re.DOTALL,
+)
+
+
+def normalize_quantity(qty_str):
+    """Rewrites a quantity into the plain ASCII form convert_to_fraction understands ('1½' -> '1 1/2')."""
+    qty_str = qty_str.strip()
+    if qty_str.lower() in WORD_QUANTITIES:
+        return WORD_QUANTITIES[qty_str.lower()]
+    for char, ascii_fraction in UNICODE_FRACTIONS.items():
+        if char in qty_str:
+            qty_str = qty_str.replace(char, ' ' + ascii_fraction)
+    qty_str = qty_str.replace('⁄', '/')
+    qty_str = re.sub(r'\s*/\s*', '/', qty_str)
+    return ' '.join(qty_str.split())
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_ingredient(ingredient_str):
+    """Parses an ingredient string like '2 Cup(s) Flour' into (qty, unit, name)."""
+    match = INGREDIENT_PATTERN.match(ingredient_str)
+    if match.group('unit') is not None:
+        quantity = normalize_quantity(match.group('before')) or "1"
+        return (quantity, match.group('unit'), match.group('after').strip())
+    if match.group('qty') is not None:
+        return (normalize_quantity(match.group('qty')), "Each", match.group('name'))
+    return ("1", "Each", match.group('bare'))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def convert_to_fraction(s):
+    """Converts a string like '1 1/2' or '3/4' or '2' to a Fraction object."""
+    s = s.strip()
+    if not s: return Fraction(0)
+    try:
+        if ' ' in s:
+            parts = s.split()
+            return int(parts[0]) + Fraction(parts[1])
+        return Fraction(s)
+    except (ValueError, ZeroDivisionError):
+        return Fraction(0)
+
+
+profiling.watch_cache("parse_ingredient", parse_ingredient)
+profiling.watch_cache("convert_to_fraction", convert_to_fraction)
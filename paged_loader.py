@@ -0,0 +1,108 @@
+from recipe_core import PAGE_SIZE, fetch_rows
+from recipe_index import row_recipe_ids
+
+# ======================================================================
+# PAGED DETAIL LOADER
+# ======================================================================
+# Once the summary columns are in and the list is drawn, the full rows are
+# pulled in the background PAGE_SIZE rows per request. Pages are queued on the
+# SheetsWorker one at a time, so a recipe the user opens before its page has
+# arrived is fetched on its own in between pages instead of waiting for the rest.
+
+
+class PagedLoader:
+    """
+    Tk-side coordinator for fetching full rows after a summary fetch.
+    on_page(rows) is called with each batch of full rows as it arrives;
+    on_done(rows, revision) once every row of the sheet has been read and the
+    sheet is still at the revision the summaries were read at, so the rows can
+    go into the cache as a complete copy.
+    """
+
+    def __init__(self, worker, storage, on_page, on_done, on_error=None, page_size=PAGE_SIZE):
+        self.worker = worker
+        self.storage = storage
+        self.on_page = on_page
+        self.on_done = on_done
+        self.on_error = on_error
+        self.page_size = page_size
+        self.row_numbers = {}  # recipe ID -> sheet row number, as of the summary fetch
+        self.revision = None
+        self.total = 0
+        self.next_row = 1
+        self.rows = []
+        self._generation = 0  # bumped on every start() so pages from an older run are ignored
+
+    def start(self, summary_rows, revision):
+        """Starts paging through the sheet the summaries were read from, dropping any earlier run."""
+        self._generation += 1
+        # A page of the old run still waiting in the queue would otherwise absorb this run's
+        # first page (same key) and then be ignored as stale, stopping paging altogether
+        self.worker.cancel("page")
+        self.row_numbers = {recipe_id: row_number for row_number, recipe_id in row_recipe_ids(summary_rows)}
+        self.revision = revision
+        self.total = len(summary_rows)
+        self.next_row = 1
+        self.rows = []
+        self._fetch_next()
+
+    @property
+    def loading(self):
+        return self.next_row <= self.total
+
+    def _fetch_next(self):
+        if self.storage is None:
+            return
+        if not self.loading:
+            generation = self._generation
+            self.worker.submit(self.storage.get_revision,
+                               on_success=lambda revision: self._finished(generation, revision),
+                               on_error=lambda error: self._failed(generation, error),
+                               key="page", label="Checking for changes")
+            return
+        first = self.next_row
+        last = min(first + self.page_size - 1, self.total)
+        generation = self._generation
+        self.worker.submit(self.storage.get_row_range, first, last,
+                           on_success=lambda rows: self._page_loaded(generation, last, rows),
+                           on_error=lambda error: self._failed(generation, error), key="page",
+                           label=f"Loading recipe details ({first}-{last} of {self.total})")
+
+    def _page_loaded(self, generation, last, rows):
+        if generation != self._generation:
+            return
+        self.next_row = last + 1
+        self.rows.extend(rows)
+        self.on_page(rows)
+        self._fetch_next()
+
+    def _finished(self, generation, revision):
+        if generation != self._generation:
+            return
+        # If someone edited the sheet mid-way the pages may not line up; the next refresh starts over
+        if revision == self.revision:
+            self.on_done(self.rows, revision)
+        self.rows = []
+
+    def _failed(self, generation, error):
+        if generation != self._generation:
+            return
+        # Stop paging; whatever isn't loaded is still fetched on demand, and the next refresh retries
+        self.next_row = self.total + 1
+        self.rows = []
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def fetch_details(self, recipe_ids, on_loaded, on_error):
+        """
+        Fetches the full rows of particular recipes ahead of the background pages.
+        Returns False (without calling anything) if none of them are on the sheet.
+        """
+        row_numbers = [self.row_numbers[recipe_id] for recipe_id in recipe_ids if recipe_id in self.row_numbers]
+        if self.storage is None or not row_numbers:
+            return False
+        # No key: every caller is waiting on its own callbacks, so requests for the
+        # same rows (opening a recipe, then listing it) mustn't collapse into one
+        self.worker.submit(fetch_rows, self.storage, row_numbers, on_success=on_loaded, on_error=on_error,
+                           label=f"Loading {len(row_numbers)} recipe(s)")
+        return True
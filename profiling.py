@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from functools import wraps
+
+# ======================================================================
+# PROFILING HOOKS
+# ======================================================================
+# Timed spans around backend calls and pipeline stages, plus named counters
+# (API calls, cells and bytes moved, cache hits). Recording is off unless
+# RECIPE_PROFILE=1 is set, the CLI is given --profile, or it is switched on in
+# the diagnostics window. While off, span() hands back one shared do-nothing
+# context manager and count() returns straight away, so the hooks can stay in
+# the code for good. Spans are kept per name (calls, total, slowest) and as a
+# bounded list of events that can be saved in the Chrome trace format and
+# opened in chrome://tracing or https://ui.perfetto.dev.
+
+TRACE_EVENT_LIMIT = 200000  # the oldest events are dropped past this many
+
+_enabled = os.environ.get("RECIPE_PROFILE") == "1"
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_spans = {}     # name -> [category, calls, total seconds, slowest seconds]
+_counters = {}  # name -> value
+_events = deque(maxlen=TRACE_EVENT_LIMIT)  # ("X", name, category, start, duration, thread) or ("C", name, time, value)
+_caches = {}    # label -> an lru_cache-wrapped function, read through cache_info()
+_cache_baseline = {}  # label -> (hits, misses) at the last reset()
+_NO_SPAN = nullcontext()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = on
+
+
+def reset():
+    """Forgets every span, counter and event recorded so far."""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _events.clear()
+        for label, cached_fn in _caches.items():
+            info = cached_fn.cache_info()
+            _cache_baseline[label] = (info.hits, info.misses)
+
+
+class _Span:
+    __slots__ = ("name", "category", "start")
+
+    def __init__(self, name, category):
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        with _lock:
+            stats = _spans.get(self.name)
+            if stats is None:
+                stats = _spans[self.name] = [self.category, 0, 0.0, 0.0]
+            stats[1] += 1
+            stats[2] += duration
+            if duration > stats[3]:
+                stats[3] = duration
+            _events.append(("X", self.name, self.category, self.start, duration, threading.get_ident()))
+        return False
+
+
+def span(name, category="app"):
+    """Context manager timing a block of code as `name`."""
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, category)
+
+
+def timed(name, category="app"):
+    """Decorator timing every call of a function as `name`."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, amount=1):
+    """Adds to a counter."""
+    if not _enabled:
+        return
+    with _lock:
+        value = _counters[name] = _counters.get(name, 0) + amount
+        _events.append(("C", name, time.perf_counter(), value))
+
+
+def watch_cache(label, cached_fn):
+    """Reports an lru_cache's hits and misses alongside the counters."""
+    _caches[label] = cached_fn
+    return cached_fn
+
+
+# ======================================================================
+# REPORTS
+# ======================================================================
+def span_stats():
+    """[(name, category, calls, total seconds, slowest seconds)], most total time first."""
+    with _lock:
+        rows = [(name, category, calls, total, slowest) for name, (category, calls, total, slowest) in _spans.items()]
+    return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+def counter_stats():
+    """[(name, value)] for the counters and the watched caches' hits and misses, by name."""
+    with _lock:
+        rows = list(_counters.items())
+    for label, cached_fn in _caches.items():
+        info = cached_fn.cache_info()
+        hits, misses = _cache_baseline.get(label, (0, 0))
+        rows.append((f"{label} cache hits", info.hits - hits))
+        rows.append((f"{label} cache misses", info.misses - misses))
+    return sorted(rows)
+
+
+def report():
+    """The span and counter tables as plain text."""
+    lines = [f"{'span':<36} {'calls':>8} {'total ms':>11} {'mean ms':>10} {'max ms':>10}"]
+    for name, _, calls, total, slowest in span_stats():
+        lines.append(f"{name:<36} {calls:>8} {total * 1000:>11.2f} {total / calls * 1000:>10.3f} "
+                     f"{slowest * 1000:>10.2f}")
+    lines.append("")
+    lines.extend(f"{name:<36} {value:>12,}" for name, value in counter_stats())
+    return "\n".join(lines) + "\n"
+
+
+def write_chrome_trace(path):
+    """Saves the recorded events as Chrome trace JSON. Returns the number of events written."""
+    with _lock:
+        events = list(_events)
+    pid = os.getpid()
+    trace = []
+    for event in events:
+        if event[0] == "X":
+            _, name, category, start, duration, thread = event
+            trace.append({"name": name, "cat": category, "ph": "X", "pid": pid, "tid": thread,
+                          "ts": (start - _origin) * 1e6, "dur": duration * 1e6})
+        else:
+            _, name, moment, value = event
+            trace.append({"name": name, "ph": "C", "pid": pid, "tid": 0,
+                          "ts": (moment - _origin) * 1e6, "args": {"value": value}})
+    with open(path, "w", encoding="utf-8") as trace_file:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, trace_file)
+    return len(trace)
@@ -0,0 +1,87 @@
+from fractions import Fraction
+from functools import lru_cache
+from math import gcd
+
+import profiling
+
+from ingredient_parser import PARSE_CACHE_SIZE, convert_to_fraction
+
+# ======================================================================
+# FIXED-DENOMINATOR QUANTITIES
+# ======================================================================
+# Kitchen amounts are halves, thirds, quarters, eighths and the odd decimal, so
+# rather than Fractions (which reduce by a gcd on every addition) quantities are
+# held as whole numbers of 1/DENOMINATOR of a unit: "1 1/2" is 10800 units.
+# Summing a grocery list is then plain integer arithmetic, and turning a total
+# back into a mixed number takes one gcd per distinct total, in a cached
+# formatter. An amount that isn't a whole number of units (1/7 cup) stays exact
+# as a Fraction number of units, which mixes freely with the integers.
+
+DENOMINATOR = 7200  # 2^5 * 3^2 * 5^2: halves down to 32nds, thirds, ninths, fifths and hundredths
+FORMAT_CACHE_SIZE = 4096
+
+
+def format_fraction(frac):
+    """Nicely formats a Fraction object into a string like '1 1/2'."""
+    if frac is None: return ""
+    if frac.denominator == 1:
+        return str(frac.numerator)
+    if frac.numerator > frac.denominator:
+        whole = frac.numerator // frac.denominator
+        rem_num = frac.numerator % frac.denominator
+        if rem_num == 0:
+            return str(whole)
+        return f"{whole} {rem_num}/{frac.denominator}"
+    return f"{frac.numerator}/{frac.denominator}"
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def to_units(qty_str):
+    """
+    The amount in a quantity string like '1 1/2', in 1/DENOMINATOR units: an int,
+    or a Fraction if it isn't a whole number of units.
+    """
+    s = qty_str.strip()
+    # Whole numbers and simple fractions, which is nearly everything, skip Fraction altogether
+    whole, _, part = s.rpartition(" ")
+    numerator, slash, denominator = part.partition("/")
+    if (not whole or whole.isdecimal()) and numerator.isdecimal() and (not slash or denominator.isdecimal()):
+        den = int(denominator) if slash else 1
+        if den and DENOMINATOR % den == 0:
+            return int(whole or 0) * DENOMINATOR + int(numerator) * (DENOMINATOR // den)
+    units = convert_to_fraction(s) * DENOMINATOR
+    return units.numerator if units.denominator == 1 else units
+
+
+def to_fraction(units):
+    """The exact Fraction of a unit that an amount in units stands for."""
+    return Fraction(units) / DENOMINATOR
+
+
+@lru_cache(maxsize=FORMAT_CACHE_SIZE)
+def format_units(units):
+    """Formats an amount in units exactly as format_fraction() formats the same Fraction."""
+    if isinstance(units, Fraction) and units.denominator == 1:
+        units = units.numerator
+    if not isinstance(units, int) or units < 0:
+        return format_fraction(to_fraction(units))
+    whole, remainder = divmod(units, DENOMINATOR)
+    if not remainder:
+        return str(whole)
+    common = gcd(remainder, DENOMINATOR)
+    fraction = f"{remainder // common}/{DENOMINATOR // common}"
+    return f"{whole} {fraction}" if whole else fraction
+
+
+def add_scaled(totals, slots, amounts, count):
+    """The bulk addition behind a grocery list: totals[slot] += amount * count for every pair."""
+    if count == 1:
+        for slot, amount in zip(slots, amounts):
+            totals[slot] += amount
+    else:
+        for slot, amount in zip(slots, amounts):
+            totals[slot] += amount * count
+
+
+profiling.watch_cache("to_units", to_units)
+profiling.watch_cache("format_units", format_units)
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import sqlite3
+
+import profiling
+from recipe_index import row_identity
+
+# ======================================================================
+# LOCAL RECIPE CACHE
+# ======================================================================
+# Keeps the last known contents of the recipe sheet in a SQLite file so the
+# hub can draw its list straight away (even offline) and only has to talk to
+# Google Sheets when the spreadsheet's modification stamp has moved. Rows can
+# also be looked up by recipe identity, to reload the details of recipes the
+# hub has dropped from memory.
+
+CACHE_FILENAME = "recipe_cache.sqlite3"
+SCHEMA_VERSION = 2
+
+
+def row_digest(row):
+    """Returns a short, stable hash of a row's cells used to spot changed rows."""
+    return hashlib.sha1(json.dumps(row, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def identity_key(row):
+    """row_identity() flattened into one indexable string."""
+    return "\0".join(row_identity(row))
+
+
+class RecipeCache:
+    """SQLite-backed copy of the sheet rows plus the revision they were read at."""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        stored_version = self._get_meta("schema_version")
+        if stored_version is not None and int(stored_version) != SCHEMA_VERSION:
+            # Layout changed between releases; the cache is disposable, so start over.
+            self.conn.execute("DROP TABLE IF EXISTS rows")
+            self._set_meta("revision", None)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                position INTEGER PRIMARY KEY,
+                digest   TEXT NOT NULL,
+                identity TEXT NOT NULL,
+                cells    TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS rows_identity ON rows (identity);
+            """
+        )
+        self._set_meta("schema_version", str(SCHEMA_VERSION))
+        self.conn.commit()
+
+    # --- Metadata helpers ---
+    def _get_meta(self, key):
+        cur = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,))
+        found = cur.fetchone()
+        return found[0] if found else None
+
+    def _set_meta(self, key, value):
+        if value is None:
+            self.conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+        else:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def get_revision(self):
+        """Returns the sheet modification stamp the cached rows were read at, or None."""
+        return self._get_meta("revision")
+
+    # --- Row access ---
+    @profiling.timed("cache.load_rows", "disk")
+    def load_rows(self):
+        """Returns every cached row (a list of cell strings) in sheet order."""
+        cur = self.conn.execute("SELECT cells FROM rows ORDER BY position")
+        return [json.loads(cells) for (cells,) in cur]
+
+    @profiling.timed("cache.find_rows", "disk")
+    def find_rows(self, row):
+        """Returns the cached rows with the same identity (title, author, date added) as `row`."""
+        cur = self.conn.execute("SELECT cells FROM rows WHERE identity = ? ORDER BY position", (identity_key(row),))
+        return [json.loads(cells) for (cells,) in cur]
+
+    @profiling.timed("cache.replace_rows", "disk")
+    def replace_rows(self, rows, revision):
+        """
+        Stores a freshly fetched copy of the sheet, only touching rows whose
+        contents actually changed. Returns the number of rows written or removed.
+        """
+        existing = dict(self.conn.execute("SELECT position, digest FROM rows"))
+        changed = []
+        for position, row in enumerate(rows):
+            digest = row_digest(row)
+            if existing.get(position) != digest:
+                changed.append((position, digest, identity_key(row), json.dumps(row, ensure_ascii=False)))
+
+        with self.conn:
+            if changed:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO rows (position, digest, identity, cells) VALUES (?, ?, ?, ?)", changed
+                )
+            cur = self.conn.execute("DELETE FROM rows WHERE position >= ?", (len(rows),))
+            self._set_meta("revision", revision)
+        return len(changed) + cur.rowcount
+
+    def clear(self):
+        """Drops every cached row and the stored revision."""
+        with self.conn:
+            self.conn.execute("DELETE FROM rows")
+            self._set_meta("revision", None)
+
+    def close(self):
+        self.conn.close()
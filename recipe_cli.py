@@ -0,0 +1,154 @@
+"""
+Command-line entry point for the Recipe Indexer. Works from the local recipe
+cache without Tk, and only connects to Google Sheets when asked to --sync.
+
+    python recipe_cli.py grocery --plan plan.json
+    python recipe_cli.py batch --plans plans.json --output-dir lists
+    python recipe_cli.py migrate
+
+A plan file maps recipe titles (or recipe IDs) to how many times to make them:
+
+    {"Chickpea Curry": 2, "Banana Bread": 1}
+
+and a plans file maps plan names to plans:
+
+    {"North kitchen": {"Chickpea Curry": 20}, "South kitchen": {"Banana Bread": 12}}
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+_started = time.perf_counter()
+
+import profiling
+from recipe_core import (BACKENDS, RecipeLibrary, check_plan, connect_storage, migrate_storage, open_recipe_cache,
+                         sync_cache)
+from storage import StorageError
+
+# Cold start (interpreter + imports + cache load) to the first line of output.
+# benchmarks.py startup checks the CLI against this.
+STARTUP_BUDGET_MS = 300
+
+
+def load_library(args):
+    """Opens the cache (syncing it with the sheet first if --sync was given) and loads it."""
+    cache = open_recipe_cache(args.cache)
+    try:
+        if args.sync:
+            sync_cache(cache, connect_storage(args.backend, args.backend_path, args.credentials))
+        # Only the recipes in the plan need their ingredients parsed
+        return RecipeLibrary.from_cache(cache, preparse=False)
+    finally:
+        cache.close()
+
+
+def read_plan(path):
+    with open(path, encoding="utf-8") as plan_file:
+        plan = json.load(plan_file)
+    check_plan(plan, path)
+    return plan
+
+
+def write_output(text, path):
+    if path:
+        with open(path, "w", encoding="utf-8") as out_file:
+            out_file.write(text)
+    else:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+def cmd_grocery(args):
+    plan = read_plan(args.plan)
+    library = load_library(args)
+    counts, unknown = library.resolve_plan(plan)
+    for key in unknown:
+        print(f"warning: no recipe called {key!r}", file=sys.stderr)
+    write_output(library.grocery_list_text(counts), args.output)
+    if args.timings:
+        print(f"first output after {(time.perf_counter() - _started) * 1000:.1f} ms "
+              f"(budget {STARTUP_BUDGET_MS} ms)", file=sys.stderr)
+    return 1 if unknown and args.strict else 0
+
+
+def cmd_batch(args):
+    # Imported here so single grocery lists don't pay for concurrent.futures
+    from batch_grocery import read_plans, run_batch, write_batch
+
+    plans = read_plans(args.plans)
+    library = load_library(args)
+    start = time.perf_counter()
+    lists, combined, unknown = run_batch(library, plans, args.workers)
+    elapsed = time.perf_counter() - start
+    for name, keys in unknown.items():
+        for key in keys:
+            print(f"warning: {name}: no recipe called {key!r}", file=sys.stderr)
+    _, combined_path = write_batch(args.output_dir, lists, combined)
+    print(f"{len(lists)} plan(s) in {elapsed:.2f} s ({len(lists) / max(elapsed, 1e-9):.1f} plans/s); "
+          f"combined list in {combined_path}")
+    return 1 if unknown and args.strict else 0
+
+
+def cmd_migrate(args):
+    storage = connect_storage(args.backend, args.backend_path, args.credentials)
+    converted = migrate_storage(storage, dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"{converted} row(s) would be converted to the compact layout")
+    else:
+        print(f"converted {converted} row(s) to the compact layout")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="recipe-indexer", description="Recipe Indexer without the GUI")
+    parser.add_argument("--cache", help="path to the local recipe cache (default: next to the app)")
+    parser.add_argument("--sync", action="store_true", help="update the cache from the storage backend first")
+    parser.add_argument("--backend", choices=BACKENDS, default="sheets", help="where recipes are stored")
+    parser.add_argument("--backend-path", help="database file for the sqlite backend")
+    parser.add_argument("--credentials", help="service account JSON (default: credentials.json)")
+    parser.add_argument("--timings", action="store_true", help="report time to first output on stderr")
+    parser.add_argument("--profile", metavar="TRACE_JSON",
+                        help="time every stage, print a summary on stderr and save a Chrome trace here")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    grocery = sub.add_parser("grocery", help="print the grocery list for a meal plan")
+    grocery.add_argument("--plan", required=True, help="JSON file of recipe title/ID -> count")
+    grocery.add_argument("--output", help="write the list here instead of stdout")
+    grocery.add_argument("--strict", action="store_true", help="exit with status 1 if a recipe isn't found")
+    grocery.set_defaults(func=cmd_grocery)
+
+    batch = sub.add_parser("batch", help="write the grocery lists for many plans, plus a combined list")
+    batch.add_argument("--plans", required=True, help="JSON file of plan name -> {recipe title/ID: count}")
+    batch.add_argument("--output-dir", required=True, help="directory to write one list per plan into")
+    batch.add_argument("--workers", type=int, help="worker processes (default: one per CPU; 1 = no pool)")
+    batch.add_argument("--strict", action="store_true", help="exit with status 1 if a recipe isn't found")
+    batch.set_defaults(func=cmd_batch)
+
+    migrate = sub.add_parser("migrate",
+                             help="rewrite legacy sheet rows in the compact layout (all ingredients in one cell)")
+    migrate.add_argument("--dry-run", action="store_true", help="only count the rows that need converting")
+    migrate.set_defaults(func=cmd_migrate)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        profiling.enable()
+    try:
+        with profiling.span(f"cli.{args.command}"):
+            return args.func(args)
+    except (OSError, ValueError, StorageError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if args.profile:
+            sys.stderr.write(profiling.report())
+            print(f"{profiling.write_chrome_trace(args.profile)} trace events saved to {args.profile}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # the batch worker pool in a frozen build
+    sys.exit(main())
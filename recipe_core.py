@@ -0,0 +1,356 @@
+import json
+import os
+import sys
+from collections import OrderedDict
+
+import profiling
+from recipe_cache import RecipeCache, CACHE_FILENAME
+from storage import GspreadStorage, InstrumentedStorage, SQLiteStorage, StorageError
+from recipe_index import (DATE_COLUMN, DEFAULT_SORT, FORMAT_COLUMN, TOTAL_COLUMNS, RecipeIndex, compact_row,
+                          is_header_row, is_recipe_row, row_date, row_details, row_identity, row_recipe_ids,
+                          to_compact)
+from grocery import IngredientStore, format_grocery_list
+from search_index import SearchIndex, query_words
+
+# ======================================================================
+# HEADLESS RECIPE CORE
+# ======================================================================
+# Everything the hub needs apart from the windows: file locations, the storage
+# backend and the loaded recipe library. Importing this module has no side
+# effects; gspread and oauth2client are only imported (and credentials only
+# read) the first time connect_to_sheet() is called, so batch jobs and the CLI
+# that work from the local cache never pay for them.
+
+SHEET_NAME = "Recipe Index"
+SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+
+# ======================================================================
+# PYINSTALLER HELPER
+# ======================================================================
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+def app_data_path(filename):
+    """ Get a writable path next to the executable (or this script) for local data """
+    if getattr(sys, 'frozen', False):
+        base_path = os.path.dirname(sys.executable)
+    else:
+        base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, filename)
+
+def open_recipe_cache(path=None):
+    """Opens the local recipe cache, by default the one next to the executable."""
+    return RecipeCache(path or app_data_path(CACHE_FILENAME))
+
+# ======================================================================
+# STORAGE BACKENDS
+# ======================================================================
+BACKENDS = ["sheets", "sqlite"]
+_sheet = None
+
+def connect_to_sheet(credentials_file=None):
+    """Authorizes and opens the recipe worksheet on first use; later calls reuse the same client."""
+    global _sheet
+    if _sheet is None:
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        creds = ServiceAccountCredentials.from_json_keyfile_name(
+            credentials_file or resource_path('credentials.json'), SCOPE
+        )
+        _sheet = GspreadStorage(gspread.authorize(creds).open(SHEET_NAME).sheet1)
+    return _sheet
+
+def connect_storage(backend="sheets", path=None, credentials_file=None):
+    """
+    Opens the named storage backend ("sheets" for Google Sheets, "sqlite" for a
+    local file), wrapped so its calls show up in the profiling reports.
+    """
+    if backend == "sheets":
+        return InstrumentedStorage(connect_to_sheet(credentials_file))
+    if backend == "sqlite":
+        return InstrumentedStorage(SQLiteStorage(path or app_data_path("recipes.sqlite3")))
+    raise ValueError(f"Unknown storage backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+
+def fetch_sheet_rows(storage, cached_revision):
+    """
+    Returns (rows, revision), or None when the storage hasn't been modified since
+    cached_revision, in which case the fetch is skipped entirely. Rows come back in
+    the sheet's own (append) order; sorting for display happens in RecipeIndex.
+    """
+    # Read the revision before the rows: if someone edits mid-fetch we'd rather fetch again next time than miss it
+    revision = storage.get_revision()
+    if cached_revision is not None and revision == cached_revision:
+        profiling.count("sheet unchanged, fetch skipped")
+        return None
+    return storage.get_all_rows(), revision
+
+def sync_cache(cache, storage):
+    """Brings the cache up to date with the storage. Returns True if anything was fetched."""
+    fetched = fetch_sheet_rows(storage, cache.get_revision())
+    if fetched is None:
+        return False
+    rows, revision = fetched
+    cache.replace_rows(rows, revision)
+    return True
+
+# ======================================================================
+# ROW FORMAT MIGRATION
+# ======================================================================
+def migrated_rows(rows):
+    """
+    Returns (rows, changed): the rows with every legacy recipe row (and the
+    header) rewritten in the compact layout, and how many of them changed.
+    """
+    migrated = []
+    changed = 0
+    for row in rows:
+        new_row = to_compact(row) if is_recipe_row(row) or is_header_row(row) else list(row)
+        # Rows can come back padded with empty cells, which don't count as a change
+        if new_row != row[:len(new_row)] or any(row[len(new_row):]):
+            changed += 1
+        migrated.append(new_row)
+    return migrated, changed
+
+def migrate_storage(storage, dry_run=False):
+    """
+    Converts a sheet to the compact row layout in a single write and returns the
+    number of rows converted. Clients keep reading both layouts, so rows added
+    by older versions in the meantime are fine and get converted next time.
+    """
+    revision = storage.get_revision()
+    rows = storage.get_all_rows()
+    migrated, changed = migrated_rows(rows)
+    if dry_run or not changed:
+        return changed
+    if revision is not None and storage.get_revision() != revision:
+        raise StorageError("The sheet changed while it was being converted; run the migration again.")
+    storage.update_rows(1, migrated)
+    return changed
+
+# ======================================================================
+# TIERED LOADING
+# ======================================================================
+# get_all_rows() drags the big instructions column along just to list titles.
+# The hub instead reads the summary columns first (enough to list, sort and
+# identify every recipe) and then the full rows a page at a time in the
+# background, or straight away for a recipe opened before its page arrived.
+# Title, author, the format tag that tells the layouts apart, and the date added
+# in either layout. On a legacy row the tag and date columns of a compact one
+# hold its first two ingredients, which are short.
+SUMMARY_COLUMNS = (0, 1, FORMAT_COLUMN, DATE_COLUMN, TOTAL_COLUMNS - 1)
+PAGE_SIZE = 500       # full rows per background request
+DETAIL_LIMIT = 2000   # recipes whose ingredients and instructions the hub keeps in memory
+
+def summary_row(cells):
+    """Turns the summary columns of a row into a compact row with no ingredients or instructions."""
+    row = [''] * TOTAL_COLUMNS
+    for column, value in zip(SUMMARY_COLUMNS, cells):
+        row[column] = value
+    return compact_row(row[0], row[1], row_date(row), [], "")
+
+def fetch_summaries(storage, cached_revision):
+    """
+    Like fetch_sheet_rows(), but only reads the summary columns. Returns
+    (summary rows, revision) with the rows widened by summary_row(), or None if
+    the storage hasn't changed since cached_revision.
+    """
+    revision = storage.get_revision()
+    if cached_revision is not None and revision == cached_revision:
+        profiling.count("sheet unchanged, fetch skipped")
+        return None
+    return [summary_row(cells) for cells in storage.get_columns(SUMMARY_COLUMNS)], revision
+
+def fetch_rows(storage, row_numbers):
+    """Fetches full rows by row number, with one request per run of consecutive rows."""
+    numbers = sorted(set(row_numbers))
+    rows = []
+    start = 0
+    while start < len(numbers):
+        end = start
+        while end + 1 < len(numbers) and numbers[end + 1] == numbers[end] + 1:
+            end += 1
+        rows.extend(storage.get_row_range(numbers[start], numbers[end]))
+        start = end + 1
+    return rows
+
+@profiling.timed("load.merge summaries")
+def merge_summaries(summary_rows, known_rows):
+    """
+    Swaps summary rows for the full rows already known locally (e.g. the cache),
+    matched by identity. Returns (rows, missing) where missing holds the IDs of
+    the recipes that are still summaries and need their details fetched.
+    """
+    known = {}
+    for row in known_rows:
+        if is_recipe_row(row):
+            known.setdefault(row_identity(row), []).append(row)
+    rows = []
+    summaries = set()
+    for position, row in enumerate(summary_rows):
+        matches = known.get(row_identity(row)) if is_recipe_row(row) else None
+        if matches:
+            rows.append(matches.pop(0))
+        else:
+            rows.append(row)
+            summaries.add(position + 1)
+    missing = {recipe_id for row_number, recipe_id in row_recipe_ids(rows) if row_number in summaries}
+    return rows, missing
+
+# ======================================================================
+# RECIPE LIBRARY
+# ======================================================================
+def check_plan(plan, source):
+    """Raises ValueError unless plan is a {recipe ID or title: whole number} object (from `source`)."""
+    if not isinstance(plan, dict):
+        raise ValueError(f"{source}: a plan must be a JSON object of recipe -> count")
+    for key, count in plan.items():
+        # bool is an int subclass, and 2.5 would otherwise be cut down to 2
+        if not isinstance(count, int) or isinstance(count, bool):
+            raise ValueError(f"{source}: the count for {key!r} must be a whole number, not {json.dumps(count)}")
+
+
+class RecipeLibrary:
+    """
+    The loaded recipes: the ID/title index plus their pre-parsed ingredients.
+    With preparse=False ingredients are only parsed for recipes that actually
+    end up on a grocery list, which is what one-shot CLI runs want. With
+    search=True a full-text index is built as well, for the search box.
+
+    Recipes listed in `missing` only have their summary columns so far (see
+    fill_details()). With a detail_limit, only that many recipes keep their
+    ingredients and instructions in memory; the least recently used ones are
+    dropped back to summaries, though their parsed ingredients and search
+    entries are kept.
+    """
+
+    def __init__(self, index=None, preparse=True, search=False, missing=(), detail_limit=None):
+        self.index = index if index is not None else RecipeIndex()
+        for recipe_id in missing:
+            recipe = self.index.get(recipe_id)
+            if recipe is not None:
+                recipe.loaded = False
+        loaded = [recipe for recipe in self.index if recipe.loaded]
+        with profiling.span("load.ingredient store"):
+            self.ingredients = IngredientStore.from_recipes(loaded) if preparse else IngredientStore()
+        # Recipes still missing their details can be found by title and author until they arrive
+        self.text_index = None
+        if search:
+            with profiling.span("load.search index"):
+                self.text_index = SearchIndex.from_recipes(self.index)
+        self.detail_limit = detail_limit
+        self.recently_used = OrderedDict.fromkeys(recipe.recipe_id for recipe in loaded)
+        self._trim()
+
+    @classmethod
+    def from_rows(cls, rows, preparse=True, sort_by=DEFAULT_SORT, search=False, missing=(), detail_limit=None):
+        with profiling.span("load.recipe index"):
+            index = RecipeIndex.from_rows(rows, sort_by)
+        return cls(index, preparse, search, missing, detail_limit)
+
+    @classmethod
+    def from_cache(cls, cache, preparse=True):
+        return cls.from_rows(cache.load_rows(), preparse)
+
+    def add_row(self, row):
+        """Adds a newly submitted sheet row and returns its Recipe."""
+        recipe = self.index.add(row)
+        self.ingredients.add_recipe(recipe.recipe_id, recipe.ingredients)
+        if self.text_index is not None:
+            self.text_index.add_recipe(recipe)
+        self.touch(recipe.recipe_id)
+        return recipe
+
+    @profiling.timed("load.fill details")
+    def fill_details(self, rows):
+        """
+        Fills in the ingredients and instructions of recipes from fetched full
+        rows, matched by identity. Returns the recipes that were updated.
+        """
+        filled = []
+        for row in rows:
+            recipe = self.index.find_row(row) if is_recipe_row(row) else None
+            if recipe is None:
+                continue  # Deleted here since the row was fetched
+            recipe.ingredients, recipe.instructions = row_details(row)
+            recipe.loaded = True
+            self.ingredients.add_recipe(recipe.recipe_id, recipe.ingredients)
+            if self.text_index is not None:
+                self.text_index.remove_recipe(recipe.recipe_id)
+                self.text_index.add_recipe(recipe)
+            self.touch(recipe.recipe_id)
+            filled.append(recipe)
+        return filled
+
+    def needs_details(self, recipe_ids):
+        """The recipes among recipe_ids whose ingredients are neither parsed nor loaded."""
+        return [recipe_id for recipe_id in recipe_ids if recipe_id not in self.ingredients.vectors
+                and self.index.get(recipe_id) is not None and not self.index.get(recipe_id).loaded]
+
+    def touch(self, recipe_id):
+        """Marks a recipe's details as recently used (e.g. because it is being displayed)."""
+        self.recently_used[recipe_id] = None
+        self.recently_used.move_to_end(recipe_id)
+        self._trim()
+
+    def _trim(self):
+        if self.detail_limit is None:
+            return
+        while len(self.recently_used) > self.detail_limit:
+            recipe_id, _ = self.recently_used.popitem(last=False)
+            recipe = self.index.get(recipe_id)
+            if recipe is not None:
+                recipe.ingredients, recipe.instructions, recipe.loaded = [], "", False
+
+    def remove(self, recipe_id):
+        """Removes a deleted recipe and returns it (or None if it wasn't loaded)."""
+        self.recently_used.pop(recipe_id, None)
+        self.ingredients.remove_recipe(recipe_id)
+        if self.text_index is not None:
+            self.text_index.remove_recipe(recipe_id)
+        return self.index.remove(recipe_id)
+
+    def search(self, query):
+        """
+        Returns the IDs of the recipes matching a search query, best match first,
+        or None if the query has no words to search for (so everything is shown).
+        """
+        if not query_words(query):
+            return None
+        return self.text_index.search(query)
+
+    def resolve_plan(self, plan):
+        """
+        Turns a meal plan ({recipe ID or title: count}, see check_plan) into {recipe ID: count}.
+        Returns (counts, unknown) where unknown lists the keys that matched nothing.
+        Titles are matched case-insensitively; a duplicated title uses its first recipe.
+        """
+        counts = {}
+        unknown = []
+        for key, count in plan.items():
+            recipe = self.index.get(key)
+            if recipe is None:
+                matches = self.index.find_by_title(key)
+                recipe = matches[0] if matches else None
+            if recipe is None:
+                unknown.append(key)
+            elif count > 0:
+                counts[recipe.recipe_id] = counts.get(recipe.recipe_id, 0) + count
+        return counts, unknown
+
+    def parse_ingredients(self, recipe_ids):
+        """Makes sure the given recipes' ingredients are parsed into the store (for preparse=False)."""
+        for recipe_id in recipe_ids:
+            recipe = self.index.get(recipe_id)
+            if recipe_id not in self.ingredients.vectors and recipe is not None and recipe.loaded:
+                self.ingredients.add_recipe(recipe_id, recipe.ingredients)
+
+    def grocery_list_text(self, counts):
+        """Returns the formatted grocery list for {recipe ID: count}."""
+        self.parse_ingredients(counts)
+        return format_grocery_list(self.ingredients.aggregate(counts))
@@ -0,0 +1,300 @@
+import hashlib
+import json
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+
+# ======================================================================
+# SHEET LAYOUT
+# ======================================================================
+# Legacy rows have one cell per ingredient, padded out to TOTAL_COLUMNS whether
+# the recipe uses them or not. Compact rows (ROW_FORMAT 2) hold the title,
+# author, a short format tag, the date added, every ingredient as one JSON cell,
+# and the instructions. New rows are always written compact, but a sheet can
+# hold both kinds until it has been migrated, so everything that reads a row
+# goes through the helpers below rather than fixed column numbers. The tag sits
+# where a legacy row has its first ingredient, so telling the layouts apart
+# only needs that one small cell, never the ingredients JSON.
+MAX_INGREDIENTS = 20  # legacy rows only
+TOTAL_COLUMNS = 1 + 1 + MAX_INGREDIENTS + 2 # Title + Author + Ingredients + Instructions + date
+HEADER_TITLES = ["title", "recipe title"]
+
+ROW_FORMAT = 2
+FORMAT_TAG = f"v{ROW_FORMAT}"  # the whole format cell of a compact row; no ingredient is just this
+COMPACT_HEADER = ["Title", "Author", "Format", "Date Added", "Ingredients", "Instructions"]
+FORMAT_COLUMN, DATE_COLUMN, INGREDIENTS_COLUMN, INSTRUCTIONS_COLUMN = 2, 3, 4, 5  # in compact rows
+
+
+def is_header_row(row):
+    """True if the row is the sheet's column header rather than a recipe."""
+    return bool(row) and row[0].lower() in HEADER_TITLES
+
+
+def cell(row, column):
+    """Returns a cell from a row, treating cells past the end of a short row as empty."""
+    return row[column] if column < len(row) else ""
+
+
+def encode_ingredients(ingredients):
+    """The single ingredients cell of a compact row."""
+    return json.dumps({"v": ROW_FORMAT, "ingredients": list(ingredients)}, ensure_ascii=False, separators=(",", ":"))
+
+
+def is_compact_row(row):
+    """True if the row is a recipe in the compact layout."""
+    return cell(row, FORMAT_COLUMN) == FORMAT_TAG
+
+
+def compact_row(title, author, date_added, ingredients, instructions):
+    """Builds a compact sheet row."""
+    return [title, author, FORMAT_TAG, date_added, encode_ingredients(ingredients), instructions]
+
+
+def to_compact(row):
+    """Rewrites a row of either layout as a compact one (the header becomes COMPACT_HEADER)."""
+    if is_header_row(row):
+        return list(COMPACT_HEADER)
+    if is_compact_row(row):
+        return list(row[:len(COMPACT_HEADER)])
+    ingredients, instructions = row_details(row)
+    return compact_row(cell(row, 0), cell(row, 1), row_date(row), ingredients, instructions)
+
+
+# ======================================================================
+# RECIPE RECORDS
+# ======================================================================
+@dataclass
+class Recipe:
+    """
+    A parsed sheet row. loaded is False while only the title, author and date
+    are known, i.e. the ingredients and instructions haven't been fetched yet
+    (or were dropped from memory again).
+    """
+    recipe_id: str
+    title: str
+    author: str
+    ingredients: list = field(default_factory=list)
+    instructions: str = ""
+    date_added: str = ""
+    loaded: bool = True
+
+    def to_row(self):
+        """Rebuilds the (compact) sheet row for this recipe."""
+        return compact_row(self.title, self.author, self.date_added, self.ingredients, self.instructions)
+
+
+def row_date(row):
+    """The date-added cell of a row in either layout."""
+    return cell(row, DATE_COLUMN) if is_compact_row(row) else cell(row, TOTAL_COLUMNS - 1)
+
+
+def row_identity(row):
+    """The fields that identify a recipe row: (title, author, date added), normalised."""
+    return (cell(row, 0).strip().lower(), cell(row, 1).strip().lower(), row_date(row).strip())
+
+
+def base_recipe_id(title, author, date_added):
+    """Derives an ID from the fields that identify a recipe, so it survives reloads and re-sorts."""
+    key = "\0".join((title.strip().lower(), author.strip().lower(), date_added.strip()))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def duplicate_id(base_id, duplicate):
+    """The ID of the nth recipe sharing base_id (the first one just uses base_id)."""
+    return base_id if duplicate == 1 else f"{base_id}-{duplicate}"
+
+
+def is_recipe_row(row):
+    """True for rows holding a recipe, i.e. not the header and not blank."""
+    return bool(row) and bool(row[0].strip()) and not is_header_row(row)
+
+
+def row_details(row):
+    """The (ingredients, instructions) of a sheet row in either layout, with empty ingredients dropped."""
+    if is_compact_row(row):
+        raw = cell(row, INGREDIENTS_COLUMN)
+        try:
+            ingredients = [ing for ing in json.loads(raw)["ingredients"] if ing.strip()]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            # Edited by hand on the sheet; keep what is there rather than fail the whole load
+            ingredients = [raw] if raw.strip() else []
+        return ingredients, cell(row, INSTRUCTIONS_COLUMN)
+    return [ing for ing in row[2:2 + MAX_INGREDIENTS] if ing.strip()], cell(row, TOTAL_COLUMNS - 2)
+
+
+def row_recipe_ids(rows):
+    """Yields (row number, recipe ID) for the recipe rows, numbering duplicates like RecipeIndex.from_rows."""
+    seen = {}
+    for row_number, row in enumerate(rows, 1):
+        if is_recipe_row(row):
+            base_id = base_recipe_id(cell(row, 0), cell(row, 1), row_date(row))
+            seen[base_id] = seen.get(base_id, 0) + 1
+            yield row_number, duplicate_id(base_id, seen[base_id])
+
+
+# ======================================================================
+# SORT ORDERS
+# ======================================================================
+# The sheet itself stays in append order; the list the user sees is ordered
+# here instead. Each sort key maps a recipe to a tuple, smallest shown first.
+def _newest_first(date_added):
+    """A sort key putting later ISO dates first and recipes without a date last."""
+    return (not date_added, tuple(-ord(c) for c in date_added))
+
+
+SORT_KEYS = {
+    "title": lambda recipe: (recipe.title.lower(), recipe.author.lower()),
+    "author": lambda recipe: (recipe.author.lower(), recipe.title.lower()),
+    # Only the date is reversed: recipes added the same day stay A to Z
+    "date": lambda recipe: (_newest_first(recipe.date_added), recipe.title.lower()),
+}
+SORT_LABELS = {"title": "Title", "author": "Author", "date": "Date added"}
+DEFAULT_SORT = "title"
+
+
+# ======================================================================
+# RECIPE INDEX
+# ======================================================================
+class RecipeIndex:
+    """
+    In-memory lookup of recipes by ID and by title, plus a sorted list for
+    display. Built once per load from the sheet rows and then kept up to date as
+    recipes are added or deleted; each add or delete places or finds the recipe
+    in the sorted list with a binary search.
+    """
+
+    def __init__(self, sort_by=DEFAULT_SORT):
+        self.by_id = {}
+        self.by_title = {}  # lowercased title -> list of recipe IDs (titles aren't unique)
+        self.sort_by = sort_by
+        self.order = []  # sorted (sort key, recipe ID) pairs
+        self.duplicates = {}  # base ID -> highest duplicate number handed out, so later rows number higher
+
+    @classmethod
+    def from_rows(cls, rows, sort_by=DEFAULT_SORT):
+        """Builds an index from raw sheet rows (header row and blank rows are skipped)."""
+        index = cls(sort_by)
+        for row in rows:
+            if is_recipe_row(row):
+                index._insert(row)
+        index._rebuild_order()
+        return index
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def get(self, recipe_id):
+        return self.by_id.get(recipe_id)
+
+    def find_by_title(self, title):
+        """Returns every recipe with the given title (case-insensitive)."""
+        return [self.by_id[recipe_id] for recipe_id in self.by_title.get(title.strip().lower(), [])]
+
+    # --- Ordering ---
+    def _sort_entry(self, recipe):
+        return (SORT_KEYS[self.sort_by](recipe), recipe.recipe_id)
+
+    def _rebuild_order(self):
+        self.order = sorted(self._sort_entry(recipe) for recipe in self.by_id.values())
+
+    def set_sort(self, sort_by):
+        """Switches the display order to one of SORT_KEYS."""
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key {sort_by!r}")
+        if sort_by != self.sort_by:
+            self.sort_by = sort_by
+            self._rebuild_order()
+
+    def ordered_ids(self):
+        """Returns every recipe ID in display order."""
+        return [recipe_id for _, recipe_id in self.order]
+
+    def in_order(self):
+        """Returns all recipes in display order."""
+        return [self.by_id[recipe_id] for recipe_id in self.ordered_ids()]
+
+    def position_of(self, recipe_id):
+        """Returns where a recipe appears in display order, or None if it isn't indexed."""
+        recipe = self.by_id.get(recipe_id)
+        if recipe is None:
+            return None
+        return bisect_left(self.order, self._sort_entry(recipe))
+
+    # --- Incremental updates ---
+    def add(self, row):
+        """Indexes a newly submitted row and slots it into the display order."""
+        recipe = self._insert(row)
+        insort(self.order, self._sort_entry(recipe))
+        return recipe
+
+    def find_row(self, row):
+        """
+        Returns the indexed recipe a full sheet row belongs to, or None. Among
+        duplicates (same title, author and date) one still missing its details wins.
+        """
+        base_id = base_recipe_id(cell(row, 0), cell(row, 1), row_date(row))
+        first = None
+        for duplicate in range(1, self.duplicates.get(base_id, 0) + 1):
+            recipe = self.by_id.get(duplicate_id(base_id, duplicate))
+            if recipe is None:
+                continue  # deleted
+            if not recipe.loaded:
+                return recipe
+            first = first or recipe
+        return first
+
+    def occurrence(self, recipe_id):
+        """
+        Which of the recipes with this one's title, author and date it is, counting
+        from 1 in sheet order, so a deletion can find the same duplicate on the sheet.
+        """
+        recipe = self.by_id[recipe_id]
+        base_id = base_recipe_id(recipe.title, recipe.author, recipe.date_added)
+        occurrence = 0
+        for duplicate in range(1, self.duplicates[base_id] + 1):
+            same = duplicate_id(base_id, duplicate)
+            if same in self.by_id:
+                occurrence += 1
+            if same == recipe_id:
+                return occurrence
+
+    def remove(self, recipe_id):
+        """Drops a deleted recipe from the index."""
+        recipe = self.by_id.get(recipe_id)
+        if recipe is None:
+            return None
+        entry = self._sort_entry(recipe)
+        position = bisect_left(self.order, entry)
+        if position < len(self.order) and self.order[position] == entry:
+            del self.order[position]
+        del self.by_id[recipe_id]
+        same_title = self.by_title[recipe.title.strip().lower()]
+        same_title.remove(recipe_id)
+        if not same_title:
+            del self.by_title[recipe.title.strip().lower()]
+        return recipe
+
+    def _insert(self, row):
+        title = cell(row, 0)
+        author = cell(row, 1)
+        date_added = row_date(row)
+        base_id = base_recipe_id(title, author, date_added)
+        # Never reuse the number of a deleted duplicate: new rows go to the end of the
+        # sheet, so numbering keeps following sheet order (see occurrence())
+        duplicate = self.duplicates[base_id] = self.duplicates.get(base_id, 0) + 1
+        recipe_id = duplicate_id(base_id, duplicate)
+
+        ingredients, instructions = row_details(row)
+        recipe = Recipe(
+            recipe_id=recipe_id,
+            title=title,
+            author=author,
+            ingredients=ingredients,
+            instructions=instructions,
+            date_added=date_added,
+        )
+        self.by_id[recipe_id] = recipe
+        self.by_title.setdefault(title.strip().lower(), []).append(recipe_id)
+        return recipe
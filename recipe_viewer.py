@@ -1,43 +1,29 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+from tkinter import ttk, messagebox, filedialog
 import sys
-import os
-from collections import defaultdict
-from fractions import Fraction
-import re
-
-# ======================================================================
-# PYINSTALLER HELPER
-# ======================================================================
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller """
-    try:
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-    return os.path.join(base_path, relative_path)
+from datetime import date
+from sheets_worker import SheetsWorker
+from virtual_list import VirtualCounterList
+from recipe_index import DEFAULT_SORT, SORT_LABELS, compact_row
+from ingredient_parser import MEASUREMENT_OPTIONS
+from recipe_core import (DETAIL_LIMIT, RecipeLibrary, connect_storage, fetch_summaries, merge_summaries,
+                         open_recipe_cache)
+from paged_loader import PagedLoader
+from write_queue import WriteBehindQueue, WriteJournal, apply_writes
+import profiling
 
 # --- GLOBAL DATA AND CONFIG ---
-all_recipes_data = []
-MAX_INGREDIENTS = 20
-TOTAL_COLUMNS = 1 + 1 + MAX_INGREDIENTS + 2 # Title + Author + Ingredients + Instructions + date
-MEASUREMENT_OPTIONS = [
-    " ", "Cup(s)", "Tsp(s)", "Tbsp(s)", "Oz", "Lb(s)", "g", "Kg",
-    "mL", "L", "Each", "Pinch", "Dash"
-]
-
-# --- GOOGLE SHEETS CONFIGURATION ---
-try:
-    credentials_file = resource_path('credentials.json')
-    SCOPE = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    CREDS = ServiceAccountCredentials.from_json_keyfile_name(credentials_file, SCOPE)
-    CLIENT = gspread.authorize(CREDS)
-    SHEET = CLIENT.open("Recipe Index").sheet1
-except Exception as e:
-    messagebox.showerror("Google Sheets Error", f"Could not connect to Google Sheets.\nPlease check 'credentials.json' and your internet connection.\n\nError: {e}")
-    sys.exit()
+LIBRARY = RecipeLibrary(search=True)
+listbox_recipe_ids = []  # recipe ID for each line of the main listbox, in display order
+RECIPE_CACHE = None  # opened when the app starts
+STORAGE = None  # stays None when running offline
+WRITES = None  # write-behind queue for submissions and deletions, created at startup
+PAGES = None  # background loader for recipe details, created at startup
+INGREDIENT_ROWS = 20  # ingredient lines the logger starts with; "Add Ingredient" adds more
+SEARCH_DELAY_MS = 150  # wait for a pause in typing before searching
+_library_generation = 0  # bumped by every load_library() so a superseded build is dropped
+DIAGNOSTICS_REFRESH_MS = 1000
+_search_after_id = None
 
 # ======================================================================
 # RECIPE LOGGER WINDOW
@@ -81,47 +67,33 @@ def open_recipe_logger_window():
             return
 
         ingredients = []
-        for i in range(MAX_INGREDIENTS):
-            quantity = ingredient_entries[i]['quantity'].get()
-            unit = ingredient_entries[i]['unit'].get()
-            name = ingredient_entries[i]['name'].get()
+        for entry in ingredient_entries:
+            quantity = entry['quantity'].get()
+            unit = entry['unit'].get()
+            name = entry['name'].get()
             if name:
                 ingredients.append(f"{quantity} {unit} {name}".strip())
         
         instructions = instructions_text.get("1.0", tk.END).strip()
 
-        # Create the fixed-width list of data
-        row_to_write = [''] * TOTAL_COLUMNS
-        
-        row_to_write[0] = recipe_title
-        row_to_write[1] = author_name
-        for i, ingredient in enumerate(ingredients):
-            if i < MAX_INGREDIENTS:
-                row_to_write[i + 2] = ingredient
-        row_to_write[TOTAL_COLUMNS - 2] = instructions
-        row_to_write[TOTAL_COLUMNS - 1] = ''
+        # All the ingredients go in one cell, so there's no limit on how many a recipe has
+        row_to_write = compact_row(recipe_title, author_name, date.today().isoformat(), ingredients, instructions)
 
-        try:
-            # Step 1: Insert the new recipe at the top (row 2)
-            SHEET.insert_row(row_to_write, 2, value_input_option='RAW')
-            
-            messagebox.showinfo("Success", "Recipe submitted successfully!", parent=logger_window)
-            
-            logger_window.destroy()
-            
-            refresh_recipe_list()
-
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred: {e}", parent=logger_window)
+        # Show the new recipe straight away; it is appended to the sheet in the next batched flush
+        recipe = LIBRARY.add_row(row_to_write)
+        WRITES.append(row_to_write)
+        show_added_recipe(recipe)
+        messagebox.showinfo("Success", "Recipe submitted successfully!", parent=logger_window)
+        logger_window.destroy()
 
     def clear_fields():
         """Clears all input fields in the logger window."""
         title_entry.delete(0, tk.END)
         author_entry.delete(0, tk.END)
-        for i in range(MAX_INGREDIENTS):
-            ingredient_entries[i]['quantity'].delete(0, tk.END)
-            ingredient_entries[i]['unit'].set('')
-            ingredient_entries[i]['name'].delete(0, tk.END)
+        for entry in ingredient_entries:
+            entry['quantity'].delete(0, tk.END)
+            entry['unit'].set('')
+            entry['name'].delete(0, tk.END)
         instructions_text.delete("1.0", tk.END)
 
     # --- UI for the Logger Window (now placed in 'second_frame') ---
@@ -144,7 +116,8 @@ def open_recipe_logger_window():
     tk.Label(ingredients_frame, text="Unit").grid(row=0, column=1)
     tk.Label(ingredients_frame, text="Ingredient Name").grid(row=0, column=2)
 
-    for i in range(MAX_INGREDIENTS):
+    def add_ingredient_row():
+        i = len(ingredient_entries)
         qty_entry = tk.Entry(ingredients_frame, width=8)
         qty_entry.grid(row=i + 1, column=0, padx=2, pady=2)
         unit_combo = ttk.Combobox(ingredients_frame, width=10, values=MEASUREMENT_OPTIONS)
@@ -153,6 +126,15 @@ def open_recipe_logger_window():
         name_entry.grid(row=i + 1, column=2, padx=2, pady=2)
         ingredient_entries.append({'quantity': qty_entry, 'unit': unit_combo, 'name': name_entry})
 
+    def on_add_ingredient():
+        add_ingredient_row()
+        second_frame.update_idletasks()
+        my_canvas.configure(scrollregion=my_canvas.bbox("all"))
+
+    for _ in range(INGREDIENT_ROWS):
+        add_ingredient_row()
+    tk.Button(second_frame, text="Add Ingredient", command=on_add_ingredient).pack()
+
     instructions_frame = tk.Frame(second_frame, padx=10, pady=5)
     instructions_frame.pack(fill='x')
     tk.Label(instructions_frame, text="Instructions:").pack()
@@ -174,125 +156,30 @@ def open_grocery_generator_window():
     generator_window.title("Grocery List Generator")
     generator_window.geometry("1400x500")
 
-    # This list of counters is now local to this window
-    recipe_counters = []
-
-    # --- Helper functions for the generator ---
-    def format_fraction(frac):
-        """Nicely formats a Fraction object into a string like '1 1/2'."""
-        if frac is None: return ""
-        if frac.denominator == 1:
-            return str(frac.numerator)
-        if frac.numerator > frac.denominator:
-            whole = frac.numerator // frac.denominator
-            rem_num = frac.numerator % frac.denominator
-            if rem_num == 0:
-                return str(whole)
-            return f"{whole} {rem_num}/{frac.denominator}"
-        return f"{frac.numerator}/{frac.denominator}"
-
-    def convert_to_fraction(s):
-        """Converts a string like '1 1/2' or '3/4' or '2' to a Fraction object."""
-        s = s.strip()
-        if not s: return Fraction(0)
-        try:
-            if ' ' in s:
-                parts = s.split()
-                return int(parts[0]) + Fraction(parts[1])
-            return Fraction(s)
-        except (ValueError, ZeroDivisionError):
-            return Fraction(0)
-
-    def parse_ingredient(ingredient_str):
-        """Parses an ingredient string like '2 Cup(s) Flour' into (qty, unit, name)."""
-        ingredient_str = ingredient_str.strip()
-        # Use a version of the units list without the blank space
-        valid_units = [u for u in MEASUREMENT_OPTIONS if u.strip()]
-        # Sort units by length, longest first, to match "Tbsp(s)" before "Tsp(s)"
-        sorted_units = sorted(valid_units, key=len, reverse=True)
-        
-        found_unit = ""
-        # Create a flexible regex to find the unit, even if it's missing the '(s)'
-        for unit in sorted_units:
-            # Prepare a regex pattern that ignores the '(s)' for matching purposes
-            pattern_base = re.escape(unit.replace('(s)', ''))
-            pattern = r'\b' + pattern_base + r'(\(s\))?\b'
-            
-            match = re.search(pattern, ingredient_str, re.IGNORECASE)
-            if match:
-                found_unit = match.group(0) # The actual unit found, e.g. "Cup" or "Cup(s)"
-                break
-        
-        if found_unit:
-            parts = re.split(r'\b' + re.escape(found_unit) + r'\b', ingredient_str, maxsplit=1, flags=re.IGNORECASE)
-            quantity_str = parts[0].strip()
-            name_str = parts[1].strip()
-            return (quantity_str, found_unit, name_str)
-        else:
-            # If no unit, assume the first word is quantity if it looks like one
-            parts = ingredient_str.split(' ', 1)
-            if len(parts) > 1 and re.match(r'^[0-9./\s]+$', parts[0]):
-                return (parts[0].strip(), "Each", parts[1].strip())
-            else:
-                return ("1", "Each", ingredient_str)
-
-    def generate_list():
-        selected_recipes = []
-        for var, title in recipe_counters:
-            if var.get() > 0:
-                selected_recipes.append({'title': title, 'count': var.get()})
-        
-        if not selected_recipes:
+    def generate_list(fetch_missing=True):
+        counts = recipe_selector.counts()
+
+        if not counts:
             messagebox.showwarning("Warning", "Please add at least one recipe.", parent=generator_window)
             return
 
-        grocery_list = defaultdict(lambda: defaultdict(Fraction))
-        for item in selected_recipes:
-            for recipe in all_recipes_data:
-                if recipe and recipe[0] == item['title']:
-                    multiplier = item['count']
-                    # Use the correct slice to get all possible ingredient columns
-                    all_possible_ingredients = recipe[1:1 + MAX_INGREDIENTS]
-                    for ing_str in all_possible_ingredients:
-                        if ing_str.strip():
-                            qty_str, unit, name = parse_ingredient(ing_str)
-                            quantity = convert_to_fraction(qty_str) * multiplier
-                            # Normalize name to be lowercase and singular for better grouping
-                            name = name.lower().strip()
-                            grocery_list[name][unit] += quantity
-                    break
-        
-        # --- MODIFIED FORMATTING SECTION ---
-        # Create a list of formatted strings to be sorted
-        output_lines = []
-        for name, amounts in grocery_list.items():
-            for unit, total_quantity in amounts.items():
-                if total_quantity > 0:
-                    # Format the parts of the line
-                    qty_str = format_fraction(total_quantity)
-                    unit_str = unit if unit != "Each" else ""
-                    # Capitalize the ingredient name for display
-                    name_str = name.capitalize()
-                    
-                    # Add to a list of tuples for sorting: (name, qty, unit)
-                    output_lines.append((name_str, qty_str, unit_str))
-        
-        # Sort the list alphabetically by the ingredient name (the first item in the tuple)
-        output_lines.sort(key=lambda x: x[0])
+        # Recipes whose details haven't arrived yet are fetched first, then we come back here
+        needed = LIBRARY.needs_details(counts)
+        if needed and fetch_missing:
+            ensure_details(needed, lambda: generate_list(fetch_missing=False))
+            return
 
-        # Build the final display text with clean alignment
-        display_text = ""
-        for name_str, qty_str, unit_str in output_lines:
-            # Use ljust to left-align the quantity in a fixed-width column
-            # This creates the clean alignment you wanted
-            aligned_qty = qty_str.ljust(8)
-            display_text += f"{aligned_qty}{unit_str} {name_str}\n"
+        # Ingredients were parsed when the recipes were loaded, so this is just a weighted sum
+        display_text = LIBRARY.grocery_list_text(counts)
 
         # --- Display the list ---
-        grocery_list_text.config(state='normal')
-        grocery_list_text.delete('1.0', tk.END)
-        grocery_list_text.insert(tk.END, display_text)
-        grocery_list_text.config(state='disabled')
+        with profiling.span("render.grocery list", "ui"):
+            grocery_list_text.config(state='normal')
+            grocery_list_text.delete('1.0', tk.END)
+            grocery_list_text.insert(tk.END, display_text)
+            grocery_list_text.config(state='disabled')
+            if profiling.enabled():
+                grocery_list_text.update_idletasks()  # so the repaint is part of the span
 
     # --- UI for the new generator window (Unchanged) ---
     left_frame = tk.Frame(generator_window, padx=10, pady=10)
@@ -301,37 +188,17 @@ def open_grocery_generator_window():
     right_frame.pack(side='right', expand=True, fill='both')
 
     tk.Label(left_frame, text="Select Meals", font=("Helvetica", 12)).pack()
-    canvas = tk.Canvas(left_frame)
-    scrollbar = ttk.Scrollbar(left_frame, orient="vertical", command=canvas.yview)
-    scrollable_frame = ttk.Frame(canvas)
-    scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-    canvas.configure(yscrollcommand=scrollbar.set)
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar.pack(side="right", fill="y")
+    # Only the visible rows get widgets, so opening this doesn't slow down as the library grows
+    recipe_selector = VirtualCounterList(
+        left_frame, [(recipe.recipe_id, recipe.title) for recipe in LIBRARY.index.in_order()], width=400
+    )
+    recipe_selector.pack(side="left", fill="both", expand=True)
 
     generate_button = tk.Button(right_frame, text="Generate Grocery List", command=generate_list)
     generate_button.pack(pady=10)
     grocery_list_text = tk.Text(right_frame, wrap='word', state='disabled', font=("Courier", 11))
     grocery_list_text.pack(expand=True, fill='both')
 
-    def decrease_count(var):
-        if var.get() > 0: var.set(var.get() - 1)
-    def increase_count(var):
-        var.set(var.get() + 1)
-
-    start_row = 1 if all_recipes_data and all_recipes_data[0][0].lower() in ["title", "recipe title"] else 0
-    for row in all_recipes_data[start_row:]:
-        if row:
-            recipe_title = row[0]
-            recipe_frame = ttk.Frame(scrollable_frame)
-            recipe_frame.pack(fill='x', expand=True, pady=2)
-            count_var = tk.IntVar(value=0)
-            ttk.Label(recipe_frame, text=recipe_title).pack(side='left', expand=True, fill='x', padx=5)
-            ttk.Button(recipe_frame, text="-", width=3, command=lambda v=count_var: decrease_count(v)).pack(side='left')
-            ttk.Label(recipe_frame, textvariable=count_var, width=3, anchor='center').pack(side='left')
-            ttk.Button(recipe_frame, text="+", width=3, command=lambda v=count_var: increase_count(v)).pack(side='left')
-            recipe_counters.append((count_var, recipe_title))
 # ======================================================================
 # MAIN RECIPE HUB APPLICATION
 # ======================================================================
@@ -345,7 +212,8 @@ def delete_selected_recipe():
         return
 
     selected_index_in_listbox = selected_indices[0]
-    recipe_title = recipe_listbox.get(selected_index_in_listbox)
+    recipe = LIBRARY.index.get(listbox_recipe_ids[selected_index_in_listbox])
+    recipe_title = recipe.title
 
     # Confirmation dialog
     is_sure = messagebox.askyesno(
@@ -356,110 +224,386 @@ def delete_selected_recipe():
     if not is_sure:
         return  # User clicked "No"
 
-    try:
-        # Determine if there's a header row in the sheet to calculate the correct offset
-        header_offset = 1 if all_recipes_data and all_recipes_data[0][0].lower() in ["title", "recipe title"] else 0
-        row_to_delete = selected_index_in_listbox + header_offset + 1
-        SHEET.delete_rows(row_to_delete)
-        messagebox.showinfo("Success", f"'{recipe_title}' has been deleted.")
-        refresh_recipe_list()  # Update the UI
+    # Remove it locally now; the deletion reaches the sheet in the next batched flush
+    nth = LIBRARY.index.occurrence(recipe.recipe_id)
+    LIBRARY.remove(recipe.recipe_id)
+    WRITES.delete(recipe.to_row(), nth)
+    recipe_listbox.delete(selected_index_in_listbox)
+    del listbox_recipe_ids[selected_index_in_listbox]
+    clear_recipe_display()
+    messagebox.showinfo("Success", f"'{recipe_title}' has been deleted.")
 
-    except Exception as e:
-        messagebox.showerror("API Error", f"An error occurred while deleting the recipe: {e}")
 
+def on_summaries_fetched(fetched):
+    """
+    Redraws the list as soon as the titles are in, using cached details where the
+    cache has them, then pages in the full rows in the background (Tk thread).
+    """
+    if fetched is None:
+        return  # Nothing changed since the last sync
+    summary_rows, revision = fetched
+    rows, missing = merge_summaries(summary_rows, RECIPE_CACHE.load_rows())
+
+    def on_loaded():
+        render_recipe_list()
+        PAGES.start(summary_rows, revision)
+    load_library(rows, missing, then=on_loaded)
+
+def on_page_loaded(rows):
+    """Fills in recipe details from a background page, updating the display if it shows one of them."""
+    filled = LIBRARY.fill_details(rows)
+    shown = selected_recipe()
+    if shown is not None and shown in filled:
+        display_recipe(shown)
+
+def on_pages_done(rows, revision):
+    """Every full row has been read: the cache now holds a complete copy of the sheet."""
+    RECIPE_CACHE.replace_rows(rows, revision)
+
+def on_sheet_fetch_failed(e):
+    messagebox.showerror("Connection Error", f"Could not refresh recipes.\nError: {e}")
+
+def ensure_details(recipe_ids, then):
+    """
+    Loads the details of recipes that only have their summary columns, from the
+    cache if it has them and from the sheet otherwise, then calls then(), which
+    also runs if the fetch fails.
+    """
+    for recipe_id in recipe_ids:
+        recipe = LIBRARY.index.get(recipe_id)
+        if recipe is not None and not recipe.loaded:
+            LIBRARY.fill_details(RECIPE_CACHE.find_rows(recipe.to_row()))
+    still_missing = [recipe_id for recipe_id in recipe_ids
+                     if LIBRARY.index.get(recipe_id) is not None and not LIBRARY.index.get(recipe_id).loaded]
+    if not still_missing:
+        then()
+        return
+
+    def on_loaded(rows):
+        LIBRARY.fill_details(rows)
+        then()
+    def on_failed(e):
+        on_sheet_fetch_failed(e)
+        then()  # Don't leave the caller waiting; it goes on with what is loaded
+    if not PAGES.fetch_details(still_missing, on_loaded, on_error=on_failed):
+        then()  # Offline, or not on the sheet yet; go on with what we have
+
+def build_library(rows, writes, sort_by, missing):
+    """Runs on the worker thread: the library for a set of rows with pending writes applied on top."""
+    return RecipeLibrary.from_rows(apply_writes(rows, writes), sort_by=sort_by, search=True, missing=missing,
+                                   detail_limit=DETAIL_LIMIT)
+
+def load_library(rows, missing=(), then=None):
+    """
+    Rebuilds the in-memory recipe index, pre-parsed ingredients and search index
+    from a set of sheet rows (where the recipes in `missing` only have their
+    summary columns so far), with any writes that haven't reached the sheet yet
+    applied on top. That takes seconds for a big sheet, so it happens on the
+    worker; the current library stays in use until the new one is swapped in,
+    and then() runs after that.
+    """
+    global _library_generation
+    _library_generation += 1
+    generation = _library_generation
+    writes = WRITES.pending()
+    newest_write = writes[-1][0] if writes else 0
+
+    def swap(library):
+        global LIBRARY
+        if generation != _library_generation:
+            return  # A newer load was asked for meanwhile
+        # A recipe added or deleted during the build isn't in it; build again rather than lose it
+        if any(seq > newest_write for seq, *_ in WRITES.pending()):
+            load_library(rows, missing, then)
+            return
+        if library.index.sort_by != LIBRARY.index.sort_by:
+            library.index.set_sort(LIBRARY.index.sort_by)
+        LIBRARY = library
+        if then is not None:
+            then()
+    # A build still waiting to start is replaced, not reused: its result would be dropped as stale
+    WORKER.cancel("library")
+    WORKER.submit(build_library, rows, writes, LIBRARY.index.sort_by, missing, on_success=swap,
+                  on_error=on_library_failed, key="library", label="Loading recipes")
+
+def on_library_failed(e):
+    messagebox.showerror("Error", f"Could not load the recipes.\nError: {e}")
+
+def on_writes_flushed(rows, revision):
+    """Records the sheet's state after a batched flush so the next refresh can skip the fetch."""
+    RECIPE_CACHE.replace_rows(rows, revision)
+
+def show_pending_writes(pending_count, error):
+    """Shows how many local changes are still waiting to reach the sheet."""
+    if not pending_count:
+        pending_label.config(text="")
+    elif STORAGE is None:
+        pending_label.config(text=f"{pending_count} change(s) will sync when online")
+    elif error is not None:
+        pending_label.config(text=f"{pending_count} change(s) waiting, retrying ({error})")
+    else:
+        pending_label.config(text=f"{pending_count} change(s) waiting to sync")
+
+def render_recipe_list():
+    """
+    Fills the listbox from the recipe index, or with the search results while
+    there is something in the search box, and clears the display panes.
+    """
+    with profiling.span("render.recipe list", "ui"):
+        recipe_listbox.delete(0, tk.END)
+        matches = LIBRARY.search(search_var.get())
+        listbox_recipe_ids[:] = LIBRARY.index.ordered_ids() if matches is None else matches
+        recipe_listbox.insert(tk.END, *(LIBRARY.index.get(recipe_id).title for recipe_id in listbox_recipe_ids))
+        clear_recipe_display()
+        if profiling.enabled():
+            recipe_listbox.update_idletasks()
+
+def on_search_typed(*args):
+    """Re-runs the search once typing pauses, rather than on every keystroke."""
+    global _search_after_id
+    if _search_after_id is not None:
+        window.after_cancel(_search_after_id)
+    _search_after_id = window.after(SEARCH_DELAY_MS, run_search)
+
+def run_search():
+    global _search_after_id
+    _search_after_id = None
+    render_recipe_list()
+
+def show_added_recipe(recipe):
+    """Slots a newly added recipe into the listbox at its sorted position, without a full redraw."""
+    if LIBRARY.search(search_var.get()) is not None:
+        render_recipe_list()  # Search results are ranked, not sorted; just search again
+        return
+    position = LIBRARY.index.position_of(recipe.recipe_id)
+    recipe_listbox.insert(position, recipe.title)
+    listbox_recipe_ids.insert(position, recipe.recipe_id)
+    recipe_listbox.see(position)
+
+def on_sort_changed(event):
+    """Re-orders the listbox when a different sort is picked."""
+    labels_to_keys = {label: key for key, label in SORT_LABELS.items()}
+    LIBRARY.index.set_sort(labels_to_keys[sort_combo.get()])
+    render_recipe_list()
+
+def clear_recipe_display():
+    """Empties the ingredient and instruction panes."""
+    ingredients_text.config(state='normal'); instructions_text.config(state='normal')
+    ingredients_text.delete('1.0', tk.END); instructions_text.delete('1.0', tk.END)
+    ingredients_text.config(state='disabled'); instructions_text.config(state='disabled')
 
 def refresh_recipe_list():
-    """Sorts the sheet and then fetches all data to populate the listbox."""
-    global all_recipes_data
-    try:
-        # --- NEW: Sort the sheet before refreshing the data ---
-        # This sorts the range A2:V by column 1 (the title, A-Z)
-        SHEET.sort((1, 'asc'), range='A2:V' + str(SHEET.row_count))
+    """
+    Queues a background sync of the local cache with the sheet. Clicking refresh
+    again while one is still waiting to run doesn't queue another fetch.
+    """
+    if STORAGE is None:
+        render_recipe_list()
+        return
+    WORKER.submit(fetch_summaries, STORAGE, RECIPE_CACHE.get_revision(), on_success=on_summaries_fetched,
+                  on_error=on_sheet_fetch_failed, key='refresh', label="Refreshing recipes")
 
-        # Now, fetch the newly sorted data
-        all_recipes_data = SHEET.get_all_values()
-        recipe_listbox.delete(0, tk.END)
-        
-        start_row = 1 if all_recipes_data and all_recipes_data[0][0].lower() in ["title", "recipe title"] else 0
-        for row in all_recipes_data[start_row:]:
-            if row:
-                recipe_listbox.insert(tk.END, row[0])
-        
-        # Clear display panes
-        ingredients_text.config(state='normal'); instructions_text.config(state='normal')
-        ingredients_text.delete('1.0', tk.END); instructions_text.delete('1.0', tk.END)
-        ingredients_text.config(state='disabled'); instructions_text.config(state='disabled')
-    except Exception as e:
-        messagebox.showerror("Connection Error", f"Could not refresh recipes.\nError: {e}")
+def show_worker_status(busy_labels):
+    """Shows what the background worker is doing in the top bar."""
+    status_label.config(text=(busy_labels[0] + "..." if busy_labels else ""))
 
-def on_recipe_select(event):
-    """Displays the selected recipe's ingredients and instructions."""
+def on_close():
+    # Unflushed writes stay in the journal and go out the next time the app starts
+    WORKER.shutdown()
+    WRITES.journal.close()
+    window.destroy()
+
+def selected_recipe():
+    """The recipe selected in the listbox, or None."""
     selected_indices = recipe_listbox.curselection()
-    if not selected_indices: return
-    
-    selected_title = recipe_listbox.get(selected_indices[0])
-    for recipe in all_recipes_data:
-        if recipe and recipe[0] == selected_title:
-            author_name = recipe[1] 
-            # --- MODIFIED SECTION: Filter out empty ingredient cells ---
-            all_possible_ingredients = recipe[2:2 + MAX_INGREDIENTS - 1]
-            
-            # Only include ingredients that are not empty strings
-            actual_ingredients = [ing for ing in all_possible_ingredients if ing.strip()]
-            
-            ingredients_display = "\n".join(f"- {ing}" for ing in actual_ingredients)
-            
-            # Ensure instructions are read from the correct, fixed position
-            instructions = recipe[TOTAL_COLUMNS - 2] if len(recipe) >= TOTAL_COLUMNS - 2 else ""
-            
-            ingredients_text.config(state='normal'); instructions_text.config(state='normal')
-            ingredients_text.delete('1.0', tk.END); instructions_text.delete('1.0', tk.END)
-            ingredients_text.insert(tk.END, ingredients_display); instructions_text.insert(tk.END, instructions)
-            ingredients_text.config(state='disabled'); instructions_text.config(state='disabled')
-            # Update the author label
-            author_label.config(text=f"Submitted by: {author_name}")
-            break
-
-# --- MAIN WINDOW GUI SETUP ---
-window = tk.Tk()
-window.title("Recipe Hub")
-window.geometry("800x600")
-
-# --- Top bar for controls ---
-top_frame = tk.Frame(window, padx=10, pady=5)
-top_frame.pack(side='top', fill='x')
-
-# Buttons on the left
-tk.Button(top_frame, text="📝 Add New Recipe", command=open_recipe_logger_window).pack(side='left')
-tk.Button(top_frame, text="🛒 Create Grocery List", command=open_grocery_generator_window).pack(side='left', padx=5)
-tk.Button(top_frame, text="🔄 Refresh List", command=refresh_recipe_list).pack(side='left')
-
-# --- Removed: Delete button on the right ---
-
-# --- Main Layout Frames ---
-list_frame = tk.Frame(window, padx=10, pady=10)
-list_frame.pack(side='left', fill='y')
-display_frame = tk.Frame(window, padx=10, pady=10)
-display_frame.pack(side='right', expand=True, fill='both')
-
-# --- Recipe List (Left Side) ---
-tk.Label(list_frame, text="Select a Recipe", font=("Helvetica", 14)).pack(pady=5)
-recipe_listbox = tk.Listbox(list_frame, width=30, font=("Helvetica", 12))
-recipe_listbox.pack(expand=True, fill='y')
-recipe_listbox.bind('<<ListboxSelect>>', on_recipe_select)
-
-# --- Recipe Display (Right Side) ---
-tk.Label(display_frame, text="Ingredients", font=("Helvetica", 14)).pack()
-ingredients_text = tk.Text(display_frame, height=10, font=("Helvetica", 11), wrap='word', state='disabled')
-ingredients_text.pack(expand=True, fill='both', pady=5)
-tk.Label(display_frame, text="Instructions", font=("Helvetica", 14)).pack()
-instructions_text = tk.Text(display_frame, height=15, font=("Helvetica", 11), wrap='word', state='disabled')
-instructions_text.pack(expand=True, fill='both', pady=5)
-
-# --- Author Display Label ---
-author_label = tk.Label(display_frame, text="", font=("Helvetica", 10, "italic"), anchor='e')
-author_label.pack(fill='x', side='bottom', padx=5)
-
-# --- Load initial data and run the app ---
-refresh_recipe_list()
-window.mainloop()
+    if not selected_indices: return None
+    return LIBRARY.index.get(listbox_recipe_ids[selected_indices[0]])
+
+def on_recipe_select(event):
+    """Displays the selected recipe's ingredients and instructions, fetching them first if needed."""
+    recipe = selected_recipe()
+    if recipe is None: return
+
+    if recipe.loaded:
+        LIBRARY.touch(recipe.recipe_id)
+        display_recipe(recipe)
+        return
+    display_recipe(recipe, loading=True)
+
+    def show_if_still_selected():
+        shown = selected_recipe()
+        if shown is not None and shown.recipe_id == recipe.recipe_id:
+            display_recipe(shown)
+    ensure_details([recipe.recipe_id], show_if_still_selected)
+
+def display_recipe(recipe, loading=False):
+    """Fills the display panes with a recipe."""
+    author_name = recipe.author
+    # Empty ingredient cells were already dropped when the index was built
+    ingredients_display = "\n".join(f"- {ing}" for ing in recipe.ingredients)
+    instructions = recipe.instructions
+    if loading:
+        ingredients_display = instructions = "Loading..."
+
+    ingredients_text.config(state='normal'); instructions_text.config(state='normal')
+    ingredients_text.delete('1.0', tk.END); instructions_text.delete('1.0', tk.END)
+    ingredients_text.insert(tk.END, ingredients_display); instructions_text.insert(tk.END, instructions)
+    ingredients_text.config(state='disabled'); instructions_text.config(state='disabled')
+    # Update the author label
+    author_label.config(text=f"Submitted by: {author_name}")
+
+# ======================================================================
+# DIAGNOSTICS WINDOW
+# ======================================================================
+def open_diagnostics_window():
+    """Shows where the time goes: timed spans, API/cell counters and cache hit rates, live."""
+    diagnostics_window = tk.Toplevel(window)
+    diagnostics_window.title("Diagnostics")
+    diagnostics_window.geometry("700x550")
+
+    controls = tk.Frame(diagnostics_window, padx=10, pady=5)
+    controls.pack(fill='x')
+    recording = tk.BooleanVar(value=profiling.enabled())
+    tk.Checkbutton(controls, text="Record timings", variable=recording,
+                   command=lambda: profiling.enable(recording.get())).pack(side='left')
+
+    def save_trace():
+        path = filedialog.asksaveasfilename(parent=diagnostics_window, defaultextension=".json",
+                                            filetypes=[("Chrome trace", "*.json")], initialfile="recipe-trace.json")
+        if not path:
+            return
+        try:
+            written = profiling.write_chrome_trace(path)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save the trace.\nError: {e}", parent=diagnostics_window)
+            return
+        messagebox.showinfo("Trace Saved", f"Saved {written} events. Open the file in chrome://tracing "
+                            "or ui.perfetto.dev.", parent=diagnostics_window)
+
+    tk.Button(controls, text="Save Trace...", command=save_trace).pack(side='right')
+    tk.Button(controls, text="Reset", command=lambda: (profiling.reset(), refresh())).pack(side='right', padx=5)
+
+    span_table = ttk.Treeview(diagnostics_window, columns=('calls', 'total', 'mean', 'max'), height=12)
+    span_table.heading('#0', text="Span")
+    for column, heading in (('calls', "Calls"), ('total', "Total ms"), ('mean', "Mean ms"), ('max', "Max ms")):
+        span_table.heading(column, text=heading)
+        span_table.column(column, width=90, anchor='e')
+    span_table.pack(fill='both', expand=True, padx=10, pady=5)
+
+    counter_table = ttk.Treeview(diagnostics_window, columns=('value',), height=8)
+    counter_table.heading('#0', text="Counter")
+    counter_table.heading('value', text="Value")
+    counter_table.column('value', width=120, anchor='e')
+    counter_table.pack(fill='both', expand=True, padx=10, pady=5)
+
+    def refresh():
+        span_table.delete(*span_table.get_children())
+        for name, _, calls, total, slowest in profiling.span_stats():
+            span_table.insert('', tk.END, text=name, values=(
+                calls, f"{total * 1000:.1f}", f"{total / calls * 1000:.2f}", f"{slowest * 1000:.1f}"))
+        counter_table.delete(*counter_table.get_children())
+        for name, value in profiling.counter_stats():
+            counter_table.insert('', tk.END, text=name, values=(f"{value:,}",))
+
+    def refresh_periodically():
+        if diagnostics_window.winfo_exists():
+            refresh()
+            window.after(DIAGNOSTICS_REFRESH_MS, refresh_periodically)
+
+    refresh_periodically()
+
+# ======================================================================
+# APP STARTUP
+# ======================================================================
+# Nothing below runs on import, so the functions above can be reused without
+# opening a window or connecting to Google Sheets.
+if __name__ == "__main__":
+    # --- LOCAL CACHE ---
+    RECIPE_CACHE = open_recipe_cache()
+
+    # --- GOOGLE SHEETS CONFIGURATION ---
+    try:
+        STORAGE = connect_storage()
+    except Exception as e:
+        if RECIPE_CACHE.get_revision() is None:
+            messagebox.showerror("Google Sheets Error", f"Could not connect to Google Sheets.\nPlease check 'credentials.json' and your internet connection.\n\nError: {e}")
+            sys.exit()
+        # We have a local copy, so start in read-only offline mode instead of quitting
+        messagebox.showwarning("Offline Mode", f"Could not connect to Google Sheets, showing the last saved recipes.\nChanges you make are kept and will be saved the next time the app starts online.\n\nError: {e}")
+
+    # --- MAIN WINDOW GUI SETUP ---
+    window = tk.Tk()
+    window.title("Recipe Hub")
+    window.geometry("800x600")
+    window.protocol("WM_DELETE_WINDOW", on_close)
+    WORKER = SheetsWorker(window, on_status=show_worker_status)
+    PAGES = PagedLoader(WORKER, STORAGE, on_page=on_page_loaded, on_done=on_pages_done,
+                        on_error=on_sheet_fetch_failed)
+    WRITES = WriteBehindQueue(
+        window, WORKER, WriteJournal(RECIPE_CACHE.path), STORAGE,
+        confirmed_state=lambda: (RECIPE_CACHE.load_rows(), RECIPE_CACHE.get_revision()),
+        on_flushed=on_writes_flushed, on_status=show_pending_writes,
+    )
+
+    # --- Top bar for controls ---
+    top_frame = tk.Frame(window, padx=10, pady=5)
+    top_frame.pack(side='top', fill='x')
+
+    # Buttons on the left
+    tk.Button(top_frame, text="📝 Add New Recipe", command=open_recipe_logger_window).pack(side='left')
+    tk.Button(top_frame, text="🛒 Create Grocery List", command=open_grocery_generator_window).pack(side='left', padx=5)
+    tk.Button(top_frame, text="🔄 Refresh List", command=refresh_recipe_list).pack(side='left')
+    tk.Button(top_frame, text="📊 Diagnostics", command=open_diagnostics_window).pack(side='left', padx=5)
+
+    # --- Removed: Delete button on the right ---
+
+    # Background activity indicator on the right
+    status_label = tk.Label(top_frame, text="", font=("Helvetica", 10, "italic"), fg="gray40")
+    status_label.pack(side='right')
+    pending_label = tk.Label(top_frame, text="", font=("Helvetica", 10, "italic"), fg="gray40")
+    pending_label.pack(side='right', padx=10)
+
+    # --- Main Layout Frames ---
+    list_frame = tk.Frame(window, padx=10, pady=10)
+    list_frame.pack(side='left', fill='y')
+    display_frame = tk.Frame(window, padx=10, pady=10)
+    display_frame.pack(side='right', expand=True, fill='both')
+
+    # --- Recipe List (Left Side) ---
+    tk.Label(list_frame, text="Select a Recipe", font=("Helvetica", 14)).pack(pady=5)
+    sort_frame = tk.Frame(list_frame)
+    sort_frame.pack(fill='x', pady=(0, 5))
+    tk.Label(sort_frame, text="Sort by:").pack(side='left')
+    sort_combo = ttk.Combobox(sort_frame, state='readonly', width=12, values=list(SORT_LABELS.values()))
+    sort_combo.set(SORT_LABELS[DEFAULT_SORT])
+    sort_combo.pack(side='left', padx=5)
+    sort_combo.bind('<<ComboboxSelected>>', on_sort_changed)
+    search_frame = tk.Frame(list_frame)
+    search_frame.pack(fill='x', pady=(0, 5))
+    tk.Label(search_frame, text="Search:").pack(side='left')
+    search_var = tk.StringVar()
+    search_var.trace_add('write', on_search_typed)
+    ttk.Entry(search_frame, textvariable=search_var).pack(side='left', fill='x', expand=True, padx=5)
+    recipe_listbox = tk.Listbox(list_frame, width=30, font=("Helvetica", 12))
+    recipe_listbox.pack(expand=True, fill='y')
+    recipe_listbox.bind('<<ListboxSelect>>', on_recipe_select)
+
+    # --- Recipe Display (Right Side) ---
+    tk.Label(display_frame, text="Ingredients", font=("Helvetica", 14)).pack()
+    ingredients_text = tk.Text(display_frame, height=10, font=("Helvetica", 11), wrap='word', state='disabled')
+    ingredients_text.pack(expand=True, fill='both', pady=5)
+    tk.Label(display_frame, text="Instructions", font=("Helvetica", 14)).pack()
+    instructions_text = tk.Text(display_frame, height=15, font=("Helvetica", 11), wrap='word', state='disabled')
+    instructions_text.pack(expand=True, fill='both', pady=5)
+
+    # --- Author Display Label ---
+    author_label = tk.Label(display_frame, text="", font=("Helvetica", 10, "italic"), anchor='e')
+    author_label.pack(fill='x', side='bottom', padx=5)
+
+    # --- Load initial data and run the app ---
+    # Draw whatever we had last time as soon as it is loaded, then catch up with the sheet
+    load_library(RECIPE_CACHE.load_rows(), then=render_recipe_list)
+    show_pending_writes(len(WRITES.journal), None)
+    WRITES.schedule_flush()  # Anything left over from last time
+    refresh_recipe_list()
+    window.mainloop()
@@ -0,0 +1,224 @@
+import re
+from array import array
+from bisect import bisect_left
+from itertools import filterfalse
+
+import profiling
+from ingredient_parser import parse_ingredient
+
+# ======================================================================
+# FULL-TEXT RECIPE SEARCH
+# ======================================================================
+# An inverted index from words to the recipes containing them, over the title,
+# author, ingredient names (as parse_ingredient() sees them, so "2 cups chickpeas"
+# indexes "chickpeas" and not "cups") and instructions. Words are kept in a
+# sorted vocabulary so a query word also matches every indexed word it is a
+# prefix of, which is what type-ahead needs: "chick" finds "chickpeas".
+#
+# Recipes are numbered in the order they were indexed. Every field has its own
+# postings, mapping a word to an array('l') of the numbers of the recipes that
+# have it in that field, so the arrays stay sorted and scoring a word is a
+# handful of dict.fromkeys() calls instead of a Python loop over every match.
+
+# Where a word appears decides how much it counts towards a recipe's rank
+FIELD_WEIGHTS = {"title": 8, "author": 4, "ingredient": 3, "instructions": 1}
+EXACT_MATCH_BONUS = 2   # a word matched exactly counts this many times more than one matched by prefix
+MIN_WORD_LENGTH = 2     # shorter query words are ignored; one letter would match half the vocabulary
+NARROW_COST = 20        # checking one recipe's text costs about as much as reading this many postings
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the then to until with".split()
+)
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    """Lowercased words in a piece of text, stop words included."""
+    return _WORD.findall(text.lower())
+
+
+def query_words(text):
+    """The words of a search query that are actually looked up."""
+    return [word for word in tokenize(text) if len(word) >= MIN_WORD_LENGTH and word not in STOP_WORDS]
+
+
+def recipe_fields(recipe):
+    """
+    The searchable text of a recipe as (weight, " word word ... ") pairs, heaviest
+    field first, with stop words and repeated words dropped. The padding spaces
+    let a word or prefix be found with a plain substring test.
+    """
+    ingredient_names = " ".join(parse_ingredient(ing_str)[2] for ing_str in recipe.ingredients)
+    fields = (
+        (FIELD_WEIGHTS["title"], recipe.title),
+        (FIELD_WEIGHTS["author"], recipe.author),
+        (FIELD_WEIGHTS["ingredient"], ingredient_names),
+        (FIELD_WEIGHTS["instructions"], recipe.instructions),
+    )
+    return tuple(
+        (weight, " " + " ".join(dict.fromkeys(filterfalse(STOP_WORDS.__contains__, tokenize(text)))) + " ")
+        for weight, text in fields
+    )
+
+
+class SearchIndex:
+    """
+    Inverted index over the loaded recipes. Built once per load and then kept
+    up to date as recipes are added or deleted, like RecipeIndex.
+    """
+
+    def __init__(self):
+        self.postings = {weight: {} for weight in FIELD_WEIGHTS.values()}  # weight -> word -> array('l')
+        self.vocabulary = []     # every indexed word, sorted, for prefix lookups
+        self.recipe_ids = []     # recipe number -> recipe ID (None once deleted)
+        self.numbers = {}        # recipe ID -> recipe number
+        self.fields = []         # recipe number -> recipe_fields(), to unindex it and to narrow results
+        self._last_query = None  # (words, {recipe number: score}) of the previous search
+
+    @classmethod
+    def from_recipes(cls, recipes):
+        index = cls()
+        for recipe in recipes:
+            number = index._number(recipe)
+            for weight, text in index.fields[number]:
+                postings = index.postings[weight]
+                for word in text.split():
+                    numbers = postings.get(word)
+                    if numbers is None:
+                        postings[word] = array('l', (number,))
+                    else:
+                        numbers.append(number)
+        index.vocabulary = sorted(set().union(*index.postings.values()))
+        return index
+
+    def __len__(self):
+        return len(self.numbers)
+
+    # --- Updates ---
+    def _number(self, recipe):
+        """Gives a recipe the next recipe number and stores its searchable text."""
+        number = len(self.recipe_ids)
+        self.recipe_ids.append(recipe.recipe_id)
+        self.numbers[recipe.recipe_id] = number
+        self.fields.append(recipe_fields(recipe))
+        return number
+
+    def add_recipe(self, recipe):
+        number = self._number(recipe)
+        for weight, text in self.fields[number]:
+            for word in text.split():
+                if not self._is_indexed(word):
+                    self.vocabulary.insert(bisect_left(self.vocabulary, word), word)
+                # The new recipe has the highest number, so appending keeps the array sorted
+                self.postings[weight].setdefault(word, array('l')).append(number)
+        self._last_query = None
+
+    def remove_recipe(self, recipe_id):
+        number = self.numbers.pop(recipe_id, None)
+        if number is None:
+            return
+        for weight, text in self.fields[number]:
+            postings = self.postings[weight]
+            for word in text.split():
+                numbers = postings[word]
+                del numbers[bisect_left(numbers, number)]
+                if not numbers:
+                    del postings[word]
+                    if not self._is_indexed(word):
+                        del self.vocabulary[bisect_left(self.vocabulary, word)]
+        self.recipe_ids[number] = None
+        self.fields[number] = ()
+        self._last_query = None
+
+    def _is_indexed(self, word):
+        return any(word in postings for postings in self.postings.values())
+
+    # --- Queries ---
+    def _expand(self, word):
+        """Every indexed word the query word is a prefix of, itself included."""
+        start = bisect_left(self.vocabulary, word)
+        end = bisect_left(self.vocabulary, word + "\uffff")
+        return self.vocabulary[start:end]
+
+    def _word_scores(self, word, matches):
+        """{recipe number: score} for one query word, from the postings of every indexed word it matches."""
+        runs = []
+        for weight, postings in self.postings.items():
+            for match in matches:
+                numbers = postings.get(match)
+                if numbers is not None:
+                    runs.append((weight * EXACT_MATCH_BONUS if match == word else weight, numbers))
+        # Lowest score first, so a recipe matching several ways ends up with its best score
+        runs.sort(key=lambda run: run[0])
+        scores = {}
+        for score, numbers in runs:
+            scores.update(dict.fromkeys(numbers, score))
+        return scores
+
+    def _narrow(self, candidates, word):
+        """Like _word_scores, but only looking at the text of recipes that already match."""
+        whole = f" {word} "
+        start = f" {word}"
+        scores = {}
+        for number in candidates:
+            best = 0
+            for weight, text in self.fields[number]:
+                if start in text:
+                    score = weight * EXACT_MATCH_BONUS if whole in text else weight
+                    if score > best:
+                        best = score
+            if best:
+                scores[number] = best
+        return scores
+
+    def _extends_last_query(self, words):
+        """True if every result for `words` must also have been a result of the previous query."""
+        if self._last_query is None:
+            return False
+        last_words, _ = self._last_query
+        return len(last_words) <= len(words) and all(new.startswith(old) for old, new in zip(last_words, words))
+
+    @profiling.timed("search.query")
+    def search(self, text):
+        """
+        Returns the IDs of recipes matching every word of the query, best match
+        first. Typing more of a query narrows the previous results rather than
+        starting over.
+        """
+        words = query_words(text)
+        if not words:
+            self._last_query = None
+            return []
+
+        # Work from the rarest word down. Once few enough recipes are left, checking
+        # their text directly is cheaper than walking a common word's postings.
+        expanded = []
+        for word in words:
+            matches = self._expand(word)
+            volume = sum(len(postings.get(match, ())) for postings in self.postings.values() for match in matches)
+            expanded.append((volume, word, matches))
+        expanded.sort(key=lambda item: item[0])
+
+        # Recipes that can still match: all of them, or the previous results if this query only extends them
+        candidates = self._last_query[1] if self._extends_last_query(words) else None
+        totals = None
+        for volume, word, matches in expanded:
+            if candidates is not None and len(candidates) * NARROW_COST < volume:
+                word_scores = self._narrow(candidates, word)
+            else:
+                word_scores = self._word_scores(word, matches)
+                if totals is None:
+                    candidates = None  # The previous results only ever narrow things down; nothing to narrow
+            if candidates is None:
+                totals = word_scores
+            else:
+                previous = totals or {}
+                totals = {number: previous.get(number, 0) + word_scores[number]
+                          for number in word_scores.keys() & candidates.keys()}
+            candidates = totals
+            if not totals:
+                break
+        self._last_query = (words, totals)
+
+        ranked = sorted(totals, key=totals.__getitem__, reverse=True)
+        return list(map(self.recipe_ids.__getitem__, ranked))
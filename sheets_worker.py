@@ -0,0 +1,142 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import profiling
+
+# ======================================================================
+# BACKGROUND SHEETS WORKER
+# ======================================================================
+# Every gspread call is a network round trip. Running them inside Tk callbacks
+# freezes the whole window, so they are queued here instead and run on a single
+# background thread (the gspread client isn't thread-safe, and running jobs one
+# at a time keeps writes and refreshes in the order they were asked for).
+# Results are handed back to the Tk thread through a queue polled with after().
+
+
+class Job:
+    """A queued Sheets operation. Callbacks always run on the Tk thread."""
+
+    def __init__(self, fn, args, on_success, on_error, key, label):
+        self.fn = fn
+        self.args = args
+        self.on_success = on_success
+        self.on_error = on_error
+        self.key = key
+        self.label = label
+        self.cancelled = False
+        self.future = None
+
+    def cancel(self):
+        """Cancels the job. If it is already running, its result is simply dropped."""
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class SheetsWorker:
+    """Runs blocking Sheets calls off the Tk mainloop, one at a time."""
+
+    def __init__(self, root, poll_ms=50, on_status=None):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.on_status = on_status
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._queued = {}   # key -> Job that has not started yet (used for coalescing)
+        self._active = []   # every job that hasn't reported back yet
+        self._poll_id = None
+
+    def submit(self, fn, *args, on_success=None, on_error=None, key=None, label=""):
+        """
+        Queues fn(*args) to run in the background. If a job with the same key is
+        still waiting to start, that job is returned instead of queueing another,
+        so repeated requests (e.g. several refresh clicks) collapse into one call.
+        """
+        with self._lock:
+            if key is not None:
+                waiting = self._queued.get(key)
+                if waiting is not None and not waiting.cancelled:
+                    return waiting
+            job = Job(fn, args, on_success, on_error, key, label)
+            if key is not None:
+                self._queued[key] = job
+            self._active.append(job)
+            job.future = self._executor.submit(self._run, job)
+        self._report_status()
+        self._schedule_poll()
+        return job
+
+    def cancel(self, key):
+        """Cancels the waiting job with the given key, if there is one."""
+        with self._lock:
+            job = self._queued.pop(key, None)
+        if job is not None:
+            job.cancel()
+
+    def busy_labels(self):
+        """Returns the labels of all jobs that are queued or running."""
+        with self._lock:
+            return [job.label for job in self._active if not job.cancelled]
+
+    def shutdown(self):
+        """Drops queued jobs and stops the worker thread once the running call returns."""
+        with self._lock:
+            for job in self._active:
+                job.cancel()
+            self._queued.clear()
+        self._executor.shutdown(wait=False)
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+
+    # --- Worker thread side ---
+    def _run(self, job):
+        with self._lock:
+            # Once a job starts, a new request with the same key must queue behind it
+            if job.key is not None and self._queued.get(job.key) is job:
+                del self._queued[job.key]
+        if job.cancelled:
+            self._results.put((job, False, None))
+            return
+        try:
+            with profiling.span(f"worker.{getattr(job.fn, '__name__', 'job')}", "worker"):
+                result = job.fn(*job.args)
+        except Exception as e:
+            self._results.put((job, False, e))
+        else:
+            self._results.put((job, True, result))
+
+    # --- Tk thread side ---
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_ms, self._drain)
+
+    def _drain(self):
+        self._poll_id = None
+        while True:
+            try:
+                job, ok, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                if job in self._active:
+                    self._active.remove(job)
+            if job.cancelled:
+                continue
+            if ok and job.on_success is not None:
+                job.on_success(payload)
+            elif not ok and job.on_error is not None:
+                job.on_error(payload)
+        # Cancelled futures never reach _run, so tidy those up here as well
+        with self._lock:
+            self._active = [job for job in self._active if not (job.cancelled and job.future.cancelled())]
+            still_busy = bool(self._active)
+        self._report_status()
+        if still_busy:
+            self._schedule_poll()
+
+    def _report_status(self):
+        if self.on_status is not None:
+            self.on_status(self.busy_labels())
@@ -0,0 +1,344 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import profiling
+
+# ======================================================================
+# RECIPE STORAGE BACKENDS
+# ======================================================================
+# Everything that persists recipes goes through a RecipeStorage, so the app can
+# run against the real Google Sheet, a local SQLite file, or an in-process fake
+# of the Sheets API used for load testing. Rows are lists of cell strings and
+# row numbers are 1-based like in the sheet, with row 1 holding the header.
+
+
+class StorageError(Exception):
+    """A backend call failed."""
+
+
+class RateLimitError(StorageError):
+    """The backend refused the call because a request quota was used up. Safe to retry later."""
+
+
+class RecipeStorage:
+    """Interface implemented by every backend."""
+
+    def get_revision(self):
+        """Returns an opaque stamp that changes whenever the data changes, or None if unknown."""
+        raise NotImplementedError
+
+    def get_all_rows(self):
+        """Returns every row, header included."""
+        raise NotImplementedError
+
+    def get_columns(self, columns):
+        """
+        Returns every row (header included) cut down to the given 0-based columns,
+        so the narrow columns can be read without the big free-text ones.
+        """
+        raise NotImplementedError
+
+    def get_row_range(self, first, last):
+        """Returns rows first to last (1-based, inclusive); rows past the end are left out."""
+        raise NotImplementedError
+
+    def append_rows(self, rows):
+        """Adds rows after the last row in a single request."""
+        raise NotImplementedError
+
+    def update_rows(self, first, rows):
+        """
+        Overwrites the rows starting at row number `first` in a single request.
+        Cells to the right of a row's last cell are cleared.
+        """
+        raise NotImplementedError
+
+    def delete_rows(self, row_numbers):
+        """Deletes several rows (numbered as they are before any deletion) in a single request."""
+        raise NotImplementedError
+
+def column_letter(column):
+    """A1-notation letter(s) for a 0-based column index: 0 -> A, 25 -> Z, 26 -> AA."""
+    letters = ""
+    column += 1
+    while column:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+# ======================================================================
+# GOOGLE SHEETS
+# ======================================================================
+class GspreadStorage(RecipeStorage):
+    """The live Google Sheet, through a gspread Worksheet."""
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+
+    def _call(self, fn, *args, **kwargs):
+        # gspread is imported lazily by whoever opened the worksheet, so look the error type up here
+        from gspread.exceptions import APIError
+        try:
+            return fn(*args, **kwargs)
+        except APIError as e:
+            if getattr(e.response, "status_code", None) == 429:
+                raise RateLimitError(str(e)) from e
+            raise
+
+    def get_revision(self):
+        try:
+            return self.worksheet.spreadsheet.get_lastUpdateTime()
+        except Exception:
+            return None
+
+    def get_all_rows(self):
+        return self._call(self.worksheet.get_all_values)
+
+    def get_columns(self, columns):
+        # One values.batchGet for all the columns; each comes back as a list of one-cell rows
+        ranges = [f"{column_letter(column)}:{column_letter(column)}" for column in columns]
+        value_ranges = self._call(self.worksheet.batch_get, ranges)
+        length = max((len(values) for values in value_ranges), default=0)
+        return [
+            [values[i][0] if i < len(values) and values[i] else "" for values in value_ranges]
+            for i in range(length)
+        ]
+
+    def get_row_range(self, first, last):
+        return [list(row) for row in self._call(self.worksheet.get, f"{first}:{last}")]
+
+    def append_rows(self, rows):
+        self._call(self.worksheet.append_rows, rows, value_input_option='RAW')
+
+    def update_rows(self, first, rows):
+        # Pad to the sheet's width so the cells a shorter row no longer uses are blanked
+        width = max([self.worksheet.col_count] + [len(row) for row in rows])
+        values = [list(row) + [""] * (width - len(row)) for row in rows]
+        self._call(self.worksheet.update, range_name=f"A{first}", values=values, value_input_option='RAW')
+
+    def delete_rows(self, row_numbers):
+        # One batchUpdate; bottom-up so earlier deletions don't shift the later ones
+        requests = [
+            {"deleteDimension": {"range": {"sheetId": self.worksheet.id, "dimension": "ROWS",
+                                           "startIndex": row_number - 1, "endIndex": row_number}}}
+            for row_number in sorted(set(row_numbers), reverse=True)
+        ]
+        if requests:
+            self._call(self.worksheet.spreadsheet.batch_update, {"requests": requests})
+
+# ======================================================================
+# SQLITE
+# ======================================================================
+class SQLiteStorage(RecipeStorage):
+    """A sheet-shaped table in a local SQLite file, for running without Google at all."""
+
+    def __init__(self, path):
+        # The worker thread makes the calls, so allow the connection to be used from it
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sheet (
+                row_number INTEGER PRIMARY KEY,
+                cells      TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS sheet_meta (
+                key   TEXT PRIMARY KEY,
+                value TEXT
+            );
+            INSERT OR IGNORE INTO sheet_meta (key, value) VALUES ('revision', '0');
+            """
+        )
+        self.conn.commit()
+
+    def _bump_revision(self):
+        self.conn.execute("UPDATE sheet_meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'revision'")
+
+    def _shift(self, from_row, delta):
+        # Move the affected rows out of the way first so the primary key never collides mid-update
+        self.conn.execute("UPDATE sheet SET row_number = -row_number WHERE row_number >= ?", (from_row,))
+        self.conn.execute("UPDATE sheet SET row_number = -row_number + ? WHERE row_number < 0", (delta,))
+
+    def get_revision(self):
+        with self.lock:
+            return self.conn.execute("SELECT value FROM sheet_meta WHERE key = 'revision'").fetchone()[0]
+
+    def get_all_rows(self):
+        with self.lock:
+            return [json.loads(cells) for (cells,) in
+                    self.conn.execute("SELECT cells FROM sheet ORDER BY row_number")]
+
+    def get_columns(self, columns):
+        return [[row[column] if column < len(row) else "" for column in columns] for row in self.get_all_rows()]
+
+    def get_row_range(self, first, last):
+        with self.lock:
+            return [json.loads(cells) for (cells,) in self.conn.execute(
+                "SELECT cells FROM sheet WHERE row_number BETWEEN ? AND ? ORDER BY row_number", (first, last))]
+
+    def append_rows(self, rows):
+        with self.lock, self.conn:
+            last = self.conn.execute("SELECT COALESCE(MAX(row_number), 0) FROM sheet").fetchone()[0]
+            self.conn.executemany("INSERT INTO sheet (row_number, cells) VALUES (?, ?)",
+                                  [(last + i + 1, json.dumps(row)) for i, row in enumerate(rows)])
+            self._bump_revision()
+
+    def update_rows(self, first, rows):
+        with self.lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO sheet (row_number, cells) VALUES (?, ?)",
+                                  [(first + i, json.dumps(row)) for i, row in enumerate(rows)])
+            self._bump_revision()
+
+    def delete_rows(self, row_numbers):
+        with self.lock, self.conn:
+            for row_number in sorted(set(row_numbers), reverse=True):
+                self.conn.execute("DELETE FROM sheet WHERE row_number = ?", (row_number,))
+                self._shift(row_number + 1, -1)
+            self._bump_revision()
+
+    def close(self):
+        self.conn.close()
+
+# ======================================================================
+# IN-PROCESS FAKE SHEETS
+# ======================================================================
+class FakeSheetsStorage(RecipeStorage):
+    """
+    An in-memory stand-in for the Sheets API. Each call sleeps for `latency`
+    seconds (plus `per_row_latency` for every row read or shifted, pro rata
+    when only some of the columns are read) and is
+    counted against a quota of `quota_per_minute` requests in any rolling
+    60-second window, raising RateLimitError once it is used up, like the
+    real API's 429 responses.
+    """
+
+    def __init__(self, rows=None, latency=0.0, per_row_latency=0.0, quota_per_minute=None, clock=time.monotonic):
+        self.rows = [list(row) for row in (rows or [])]
+        self.latency = latency
+        self.per_row_latency = per_row_latency
+        self.quota_per_minute = quota_per_minute
+        self.clock = clock
+        self.revision = 0
+        self.calls = {}
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def _request(self, name, rows_touched=0):
+        with self._lock:
+            if self.quota_per_minute is not None:
+                now = self.clock()
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.quota_per_minute:
+                    raise RateLimitError(f"Quota exceeded: {self.quota_per_minute} requests per minute")
+                self._recent.append(now)
+            self.calls[name] = self.calls.get(name, 0) + 1
+        delay = self.latency + self.per_row_latency * rows_touched
+        if delay:
+            time.sleep(delay)
+
+    def get_revision(self):
+        self._request("get_revision")
+        return str(self.revision)
+
+    def get_all_rows(self):
+        self._request("get_all_rows", len(self.rows))
+        with self._lock:
+            return [list(row) for row in self.rows]
+
+    def get_columns(self, columns):
+        width = max((len(row) for row in self.rows), default=1) or 1
+        self._request("get_columns", len(self.rows) * len(columns) / width)
+        with self._lock:
+            return [[row[column] if column < len(row) else "" for column in columns] for row in self.rows]
+
+    def get_row_range(self, first, last):
+        with self._lock:
+            rows = [list(row) for row in self.rows[first - 1:last]]
+        self._request("get_row_range", len(rows))
+        return rows
+
+    def append_rows(self, rows):
+        self._request("append_rows", len(rows))
+        with self._lock:
+            self.rows.extend(list(row) for row in rows)
+            self.revision += 1
+
+    def update_rows(self, first, rows):
+        self._request("update_rows", len(rows))
+        with self._lock:
+            self.rows[first - 1:first - 1 + len(rows)] = [list(row) for row in rows]
+            self.revision += 1
+
+    def delete_rows(self, row_numbers):
+        doomed = set(row_numbers)
+        self._request("delete_rows", len(self.rows) - min(doomed, default=len(self.rows)))
+        with self._lock:
+            self.rows = [row for number, row in enumerate(self.rows, 1) if number not in doomed]
+            self.revision += 1
+
+# ======================================================================
+# INSTRUMENTATION
+# ======================================================================
+def _cells_and_chars(rows):
+    return sum(map(len, rows)), sum(len(value) for row in rows for value in row)
+
+
+class InstrumentedStorage(RecipeStorage):
+    """
+    Wraps another backend, timing every call and counting API calls and the
+    cells and characters read and written (see profiling.py).
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def __getattr__(self, name):
+        return getattr(self.storage, name)  # close() and the like
+
+    def _read(self, name, fn, *args):
+        with profiling.span(f"storage.{name}", "network"):
+            rows = fn(*args)
+        if profiling.enabled():
+            cells, chars = _cells_and_chars(rows)
+            profiling.count("api calls")
+            profiling.count("cells read", cells)
+            profiling.count("characters read", chars)
+        return rows
+
+    def _write(self, name, fn, *args, rows=()):
+        with profiling.span(f"storage.{name}", "network"):
+            result = fn(*args)
+        if profiling.enabled():
+            cells, chars = _cells_and_chars(rows)
+            profiling.count("api calls")
+            profiling.count("cells written", cells)
+            profiling.count("characters written", chars)
+        return result
+
+    def get_revision(self):
+        with profiling.span("storage.get_revision", "network"):
+            revision = self.storage.get_revision()
+        profiling.count("api calls")
+        return revision
+
+    def get_all_rows(self):
+        return self._read("get_all_rows", self.storage.get_all_rows)
+
+    def get_columns(self, columns):
+        return self._read("get_columns", self.storage.get_columns, columns)
+
+    def get_row_range(self, first, last):
+        return self._read("get_row_range", self.storage.get_row_range, first, last)
+
+    def append_rows(self, rows):
+        return self._write("append_rows", self.storage.append_rows, rows, rows=rows)
+
+    def update_rows(self, first, rows):
+        return self._write("update_rows", self.storage.update_rows, first, rows, rows=rows)
+
+    def delete_rows(self, row_numbers):
+        return self._write("delete_rows", self.storage.delete_rows, row_numbers)
@@ -0,0 +1,32 @@
+import time
+
+
+class FakeRoot:
+    """
+    Stands in for the Tk root in tests. after() callbacks only run when pump()
+    is called, straight away whatever their delay, so backoffs and flush delays
+    don't slow the tests down.
+    """
+
+    def __init__(self):
+        self.callbacks = {}
+        self._next_id = 0
+
+    def after(self, ms, fn):
+        self._next_id += 1
+        self.callbacks[self._next_id] = fn
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        self.callbacks.pop(after_id, None)
+
+    def pump(self, until, timeout=5.0):
+        """Runs due callbacks (and waits for the worker thread) until until() is true."""
+        deadline = time.monotonic() + timeout
+        while not until():
+            if time.monotonic() > deadline:
+                raise AssertionError("timed out waiting for the worker")
+            callbacks, self.callbacks = self.callbacks, {}
+            for fn in callbacks.values():
+                fn()
+            time.sleep(0.005)
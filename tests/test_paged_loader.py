@@ -0,0 +1,78 @@
+import threading
+import unittest
+
+from paged_loader import PagedLoader
+from recipe_index import COMPACT_HEADER, compact_row, row_recipe_ids
+from sheets_worker import SheetsWorker
+from storage import FakeSheetsStorage
+from tests.fake_root import FakeRoot
+
+ROWS = [list(COMPACT_HEADER)] + [
+    compact_row(f"Recipe {n}", "Test", "2024-01-01", [f"{n} Each Egg"], "") for n in range(1, 31)
+]
+
+
+class PagedLoaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.worker = SheetsWorker(self.root, poll_ms=1)
+        self.storage = FakeSheetsStorage(ROWS)
+        self.done = []
+        self.loader = PagedLoader(self.worker, self.storage, on_page=lambda rows: None,
+                                  on_done=lambda rows, revision: self.done.append(rows), page_size=8)
+        # Holds the worker thread so jobs stay queued until the test lets it go
+        self.gate = threading.Event()
+        self.worker.submit(self.gate.wait, 5)
+
+    def tearDown(self):
+        self.gate.set()
+        self.worker.shutdown()
+
+    def test_restart_with_a_page_still_queued(self):
+        revision = self.storage.get_revision()
+        self.loader.start(ROWS, revision)
+        self.loader.start(ROWS, revision)
+        self.gate.set()
+        self.root.pump(lambda: self.done)
+
+        self.assertEqual(self.done, [ROWS])
+        self.assertFalse(self.loader.loading)
+
+    def test_detail_fetches_for_the_same_rows_all_call_back(self):
+        self.loader.start(ROWS, self.storage.get_revision())
+        recipe_ids = [recipe_id for _, recipe_id in row_recipe_ids(ROWS)][20:22]
+        loaded = []
+        for caller in ("viewer", "grocery list"):
+            self.assertTrue(self.loader.fetch_details(recipe_ids, lambda rows, caller=caller: loaded.append(caller),
+                                                      on_error=self.fail))
+        self.gate.set()
+        self.root.pump(lambda: len(loaded) == 2)
+
+        self.assertEqual(loaded, ["viewer", "grocery list"])
+
+    def test_detail_fetch_for_rows_not_on_the_sheet(self):
+        self.loader.start(ROWS, self.storage.get_revision())
+        self.assertFalse(self.loader.fetch_details(["not-a-recipe"], self.fail, self.fail))
+
+
+class SheetsWorkerTest(unittest.TestCase):
+
+    def test_requests_with_the_same_key_collapse_while_queued(self):
+        root = FakeRoot()
+        worker = SheetsWorker(root, poll_ms=1)
+        gate = threading.Event()
+        worker.submit(gate.wait, 5)
+        results = []
+        first = worker.submit(lambda: "refreshed", on_success=results.append, key="refresh")
+        second = worker.submit(lambda: "refreshed", on_success=results.append, key="refresh")
+        gate.set()
+        root.pump(lambda: results and not worker.busy_labels())
+        worker.shutdown()
+
+        self.assertIs(first, second)
+        self.assertEqual(results, ["refreshed"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from recipe_index import COMPACT_HEADER, compact_row
+from sheets_worker import SheetsWorker
+from storage import FakeSheetsStorage, RateLimitError
+from tests.fake_root import FakeRoot
+from write_queue import WriteBehindQueue, WriteJournal, apply_writes
+
+HEADER = list(COMPACT_HEADER)
+MOMS_FIRST = compact_row("Pancakes", "Mom", "", ["1 Cup(s) Flour"], "first")
+MOMS_SECOND = compact_row("Pancakes", "Mom", "", ["2 Cup(s) Flour"], "second")
+WAFFLES = compact_row("Waffles", "Dad", "2024-05-01", ["1 Each Egg"], "")
+
+
+class RateLimitedOnce(FakeSheetsStorage):
+    """Turns down the first append_rows() with a quota error."""
+
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.refused = 0
+
+    def append_rows(self, rows):
+        if not self.refused:
+            self.refused += 1
+            raise RateLimitError("Quota exceeded")
+        super().append_rows(rows)
+
+
+class WriteBehindQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = FakeRoot()
+        self.worker = SheetsWorker(self.root, poll_ms=1)
+        self.journal = WriteJournal(":memory:")
+        self.errors = []
+
+    def tearDown(self):
+        self.worker.shutdown()
+        self.journal.close()
+
+    def make_queue(self, storage):
+        confirmed = {"rows": storage.get_all_rows(), "revision": storage.get_revision()}
+
+        def on_flushed(rows, revision):
+            confirmed["rows"], confirmed["revision"] = rows, revision
+
+        def on_status(pending, error):
+            if error is not None:
+                self.errors.append(error)
+
+        return WriteBehindQueue(self.root, self.worker, self.journal, storage,
+                                lambda: (confirmed["rows"], confirmed["revision"]), on_flushed, on_status)
+
+    def test_rate_limited_append_after_delete(self):
+        storage = RateLimitedOnce([HEADER, MOMS_FIRST, MOMS_SECOND, WAFFLES])
+        writes = self.make_queue(storage)
+        writes.delete(MOMS_SECOND, 2)
+        writes.append(compact_row("Crepes", "Mom", "2024-06-01", [], ""))
+        self.root.pump(lambda: len(self.journal) == 0)
+
+        self.assertEqual(len(self.errors), 1)
+        self.assertIsInstance(self.errors[0], RateLimitError)
+        # The retry only resends the append; the deletion was acknowledged before it
+        self.assertEqual(storage.calls["delete_rows"], 1)
+        self.assertEqual([row[0] for row in storage.rows], ["Title", "Pancakes", "Waffles", "Crepes"])
+        self.assertEqual(storage.rows[1][-1], "first")
+
+    def test_deleting_a_duplicate_not_yet_appended(self):
+        storage = FakeSheetsStorage([HEADER, MOMS_FIRST])
+        writes = self.make_queue(storage)
+        writes.append(MOMS_SECOND)
+        writes.delete(MOMS_SECOND, 2)
+        self.root.pump(lambda: len(self.journal) == 0)
+
+        self.assertNotIn("append_rows", storage.calls)
+        self.assertNotIn("delete_rows", storage.calls)
+        self.assertEqual(storage.rows, [HEADER, MOMS_FIRST])
+
+
+class ApplyWritesTest(unittest.TestCase):
+
+    def test_deletes_the_nth_duplicate(self):
+        rows = [HEADER, MOMS_FIRST, MOMS_SECOND]
+        writes = [(1, "delete", MOMS_SECOND, 2)]
+        self.assertEqual(apply_writes(rows, writes), [HEADER, MOMS_FIRST])
+
+    def test_missing_duplicate_deletes_nothing(self):
+        rows = [HEADER, MOMS_FIRST]
+        self.assertEqual(apply_writes(rows, [(1, "delete", MOMS_FIRST, 2)]), rows)
+
+
+class WriteJournalTest(unittest.TestCase):
+
+    def test_journal_from_before_nth_deletes_the_first_match(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite3")
+            conn = sqlite3.connect(path)
+            conn.execute("CREATE TABLE pending_writes (seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                         "op TEXT NOT NULL, row TEXT NOT NULL)")
+            conn.execute("INSERT INTO pending_writes (op, row) VALUES ('delete', '[\"Pancakes\"]')")
+            conn.commit()
+            conn.close()
+
+            journal = WriteJournal(path)
+            self.assertEqual(journal.pending(), [(1, "delete", ["Pancakes"], 1)])
+            journal.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
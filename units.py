@@ -0,0 +1,113 @@
+from fractions import Fraction
+from math import gcd
+
+from ingredient_parser import MEASUREMENT_OPTIONS
+from quantity import DENOMINATOR, format_units
+
+# ======================================================================
+# UNIT CANONICALIZATION
+# ======================================================================
+# parse_ingredient() returns the unit as written ("cup", "Cups", "Cup(s)"). For
+# a grocery list every spelling is looked up once in UNIT_TABLE, which gives the
+# dimension it measures and how many base units of that dimension it is, so
+# amounts of the same ingredient add up in base units whatever they were
+# written in. Only when the list is printed is each total turned back into the
+# largest unit it can be measured out in (3 Tsp(s) -> 1 Tbsp(s), 8 Tbsp(s) ->
+# 1/2 Cup(s)), or failing that the largest unit there is at least one of
+# (145 Tsp(s) -> 3 1/48 Cup(s), 1100 g -> 1.1 Kg).
+#
+# US and metric measures are separate dimensions: converting between them
+# isn't exact, and a recipe that says "250 mL" means 250 mL.
+
+# Display unit -> (dimension, size in the dimension's base unit). The base unit has size 1.
+UNITS = {
+    "Tsp(s)": ("us volume", 1), "Tbsp(s)": ("us volume", 3), "Cup(s)": ("us volume", 48),
+    "Oz": ("us weight", 1), "Lb(s)": ("us weight", 16),
+    "g": ("metric mass", 1), "Kg": ("metric mass", 1000),
+    "mL": ("metric volume", 1), "L": ("metric volume", 1000),
+    "Each": ("count", 1), "Pinch": ("pinch", 1), "Dash": ("dash", 1),
+}
+# Larger US unit -> the denominators an amount can be measured out with in it.
+# These follow the usual measures: there are 1/3 and 2/3 cups, but no 1/8 cup or
+# third of a tablespoon, so 18 Tbsp(s) stay 18 Tbsp(s) rather than becoming
+# 1 1/8 Cup(s).
+DISPLAY_DENOMINATORS = {
+    "Tbsp(s)": frozenset((1, 2)), "Cup(s)": frozenset((1, 2, 3, 4)), "Lb(s)": frozenset((1, 2, 4)),
+}
+# Metric units shown as decimals, and only from 1 up: 1.25 Kg, but 250 g rather than 1/4 Kg.
+DECIMAL_UNITS = {"Kg": 1000, "L": 1000}  # unit -> base units in it, a power of ten
+
+
+def _spellings(unit):
+    """Every way the parser accepts a unit to be written: 'Cup(s)' -> cup, cup(s), cups, cupes."""
+    base = unit.replace("(s)", "").lower()
+    if len(base) > 1:
+        return {base, base + "(s)", base + "s", base + "es"}
+    return {base, base + "(s)"}
+
+
+def _build_unit_table():
+    table = {}
+    for unit in MEASUREMENT_OPTIONS:
+        if unit.strip():
+            dimension, size = UNITS[unit]
+            for spelling in _spellings(unit):
+                table[spelling] = (dimension, size)
+    return table
+
+
+def _build_display_units():
+    display_units = {}
+    for unit, (dimension, size) in sorted(UNITS.items(), key=lambda item: -item[1][1]):
+        display_units.setdefault(dimension, []).append((unit, size))
+    return display_units
+
+
+UNIT_TABLE = _build_unit_table()  # lowercased spelling -> (dimension, size in base units)
+DISPLAY_UNITS = _build_display_units()  # dimension -> [(display unit, size)], largest first
+
+
+def canonical_unit(unit):
+    """
+    (dimension, size in base units) for a unit as parse_ingredient() returned it.
+    A unit the table doesn't know is its own dimension.
+    """
+    return UNIT_TABLE.get(unit.lower()) or (unit, 1)
+
+
+def _reads_naturally(unit, amount):
+    return DENOMINATOR // gcd(amount % DENOMINATOR, DENOMINATOR) in DISPLAY_DENOMINATORS[unit]
+
+
+def display_amount(dimension, amount):
+    """
+    Turns a total in base units (see quantity.py for the amounts themselves) into
+    (display unit, amount in that unit). That is the largest unit the total is a
+    kitchen-friendly amount of, even if that is less than one (1/2 Cup(s), 18
+    Tbsp(s)); otherwise the largest unit there is at least one of, with whatever
+    is left over as part of the amount (3 1/48 Cup(s), 2 1/16 Lb(s), 1.1 Kg).
+    """
+    candidates = DISPLAY_UNITS.get(dimension)
+    if candidates is None:
+        return dimension, amount
+    # Amounts that aren't whole units (1/7 cup) stay in the base unit, where they are exact
+    if isinstance(amount, int):
+        for unit, size in candidates[:-1]:
+            if unit in DISPLAY_DENOMINATORS and amount % size == 0 and _reads_naturally(unit, amount // size):
+                return unit, amount // size
+        for unit, size in candidates[:-1]:
+            # Kg and L only to the gram or millilitre, so the decimal is exact
+            if amount >= size * DENOMINATOR and (unit not in DECIMAL_UNITS or amount % DENOMINATOR == 0):
+                return unit, amount // size if amount % size == 0 else Fraction(amount, size)
+    unit, _ = candidates[-1]
+    return unit, amount
+
+
+def format_amount(unit, amount):
+    """Formats an amount from display_amount() for the grocery list."""
+    size = DECIMAL_UNITS.get(unit)
+    if size is None:
+        return format_units(amount)
+    whole, part = divmod(int(Fraction(amount * size, DENOMINATOR)), size)
+    decimals = str(size + part)[1:].rstrip("0")  # zero-padded to the width of size, then trimmed
+    return f"{whole}.{decimals}" if decimals else str(whole)
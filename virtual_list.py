@@ -0,0 +1,118 @@
+import tkinter as tk
+from array import array
+from tkinter import ttk
+
+# ======================================================================
+# VIRTUALIZED RECIPE COUNTER LIST
+# ======================================================================
+# The grocery generator used to build a frame, two labels, two buttons and an
+# IntVar for every recipe each time it opened. This list only creates enough
+# rows to fill the visible area and reuses them while scrolling: scrolling just
+# changes which recipe each row shows. Counts live in a plain array, one slot
+# per recipe, so the number of widgets doesn't depend on the library size.
+
+ROW_HEIGHT = 30  # pixels per recipe row
+
+
+class VirtualCounterList(tk.Frame):
+    """
+    A scrollable list of recipe titles with -/+ counters. `recipes` is a list of
+    (recipe ID, title) in display order; counts() returns {recipe ID: count} for
+    every recipe with a non-zero count.
+    """
+
+    def __init__(self, parent, recipes, width=400, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.recipe_ids = [recipe_id for recipe_id, _ in recipes]
+        self.titles = [title for _, title in recipes]
+        self.count_array = array('l', bytes(array('l').itemsize * len(recipes)))
+        self.top = 0  # index of the recipe shown in the first row
+        self.rows = []  # recycled (frame, title label, count label) tuples
+
+        self.viewport = tk.Frame(self, width=width, height=ROW_HEIGHT * 10)
+        self.viewport.pack(side='left', fill='both', expand=True)
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self.yview)
+        self.scrollbar.pack(side='right', fill='y')
+
+        self.viewport.bind('<Configure>', lambda e: self._layout())
+        for widget in (self.viewport, self.scrollbar):
+            widget.bind('<MouseWheel>', self._on_mouse_wheel)
+            widget.bind('<Button-4>', lambda e: self.scroll(-3))  # X11 wheel up
+            widget.bind('<Button-5>', lambda e: self.scroll(3))   # X11 wheel down
+
+    # --- Counts ---
+    def counts(self):
+        return {self.recipe_ids[i]: count for i, count in enumerate(self.count_array) if count > 0}
+
+    def _bump(self, slot, delta):
+        index = self.top + slot
+        if index < len(self.count_array):
+            self.count_array[index] = max(0, self.count_array[index] + delta)
+            self.rows[slot][2].config(text=str(self.count_array[index]))
+
+    # --- Scrolling ---
+    def _visible_rows(self):
+        return max(1, self.viewport.winfo_height() // ROW_HEIGHT)
+
+    def _max_top(self):
+        return max(0, len(self.recipe_ids) - self._visible_rows())
+
+    def scroll(self, rows):
+        self._scroll_to(self.top + rows)
+
+    def _scroll_to(self, top):
+        top = min(max(0, top), self._max_top())
+        if top != self.top:
+            self.top = top
+            self._refresh()
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')."""
+        if args[0] == 'moveto':
+            self._scroll_to(round(float(args[1]) * len(self.recipe_ids)))
+        elif args[0] == 'scroll':
+            step = self._visible_rows() if args[2] == 'pages' else 1
+            self.scroll(int(args[1]) * step)
+
+    def _on_mouse_wheel(self, event):
+        self.scroll(-3 if event.delta > 0 else 3)
+
+    # --- Rows ---
+    def _layout(self):
+        """Creates rows until the viewport is full (they are never destroyed, just reused)."""
+        needed = self._visible_rows() + 1
+        while len(self.rows) < needed:
+            self.rows.append(self._make_row(len(self.rows)))
+        self._scroll_to(self.top)  # a taller window may leave empty space at the bottom
+        self._refresh()
+
+    def _make_row(self, slot):
+        frame = ttk.Frame(self.viewport)
+        frame.place(x=0, y=slot * ROW_HEIGHT, relwidth=1, height=ROW_HEIGHT)
+        title_label = ttk.Label(frame, anchor='w')
+        title_label.pack(side='left', expand=True, fill='x', padx=5)
+        ttk.Button(frame, text="-", width=3, command=lambda: self._bump(slot, -1)).pack(side='left')
+        count_label = ttk.Label(frame, width=3, anchor='center')
+        count_label.pack(side='left')
+        ttk.Button(frame, text="+", width=3, command=lambda: self._bump(slot, 1)).pack(side='left')
+        for widget in (frame, title_label, count_label):
+            widget.bind('<MouseWheel>', self._on_mouse_wheel)
+            widget.bind('<Button-4>', lambda e: self.scroll(-3))
+            widget.bind('<Button-5>', lambda e: self.scroll(3))
+        return frame, title_label, count_label
+
+    def _refresh(self):
+        """Points every row at the recipe it should show now and updates the scrollbar."""
+        for slot, (frame, title_label, count_label) in enumerate(self.rows):
+            index = self.top + slot
+            if index < len(self.recipe_ids):
+                title_label.config(text=self.titles[index])
+                count_label.config(text=str(self.count_array[index]))
+                frame.place(x=0, y=slot * ROW_HEIGHT, relwidth=1, height=ROW_HEIGHT)
+            else:
+                frame.place_forget()
+        total = len(self.recipe_ids)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self._visible_rows()) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
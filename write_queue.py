@@ -0,0 +1,273 @@
+import json
+import random
+import sqlite3
+
+from recipe_index import is_header_row, row_identity
+from storage import RateLimitError
+
+# ======================================================================
+# WRITE-BEHIND QUEUE
+# ======================================================================
+# Submissions and deletions are applied to the in-memory library straight away
+# and recorded in a journal table in the local cache file. The journal is then
+# flushed to the storage backend in batches: every pending deletion goes out in
+# one delete_rows() request and every new recipe in one append_rows() request,
+# instead of a request per recipe. Deletions are acknowledged as soon as their
+# request succeeds, before the appends are sent, so a retry never matches them
+# against the sheet a second time (and takes out a duplicate with the same
+# title, author and date). A deletion also records which of several rows with
+# the same title, author and date it meant, so the right duplicate goes.
+# Pending writes survive restarts, and quota errors back off and retry.
+
+APPEND = "append"
+DELETE = "delete"
+
+FLUSH_DELAY_MS = 2000      # wait for a burst of edits to finish before flushing
+MIN_BACKOFF_MS = 1000
+MAX_BACKOFF_MS = 64000
+
+
+class WriteJournal:
+    """Pending writes, persisted in SQLite so nothing is lost if the app closes before a flush."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_writes (
+                seq     INTEGER PRIMARY KEY AUTOINCREMENT,
+                op      TEXT NOT NULL,
+                row     TEXT NOT NULL,
+                nth     INTEGER NOT NULL DEFAULT 1
+            )
+            """
+        )
+        # Journals written before deletions recorded which duplicate they meant
+        columns = {info[1] for info in self.conn.execute("PRAGMA table_info(pending_writes)")}
+        if "nth" not in columns:
+            self.conn.execute("ALTER TABLE pending_writes ADD COLUMN nth INTEGER NOT NULL DEFAULT 1")
+        self.conn.commit()
+
+    def add(self, op, row, nth=1):
+        with self.conn:
+            cur = self.conn.execute("INSERT INTO pending_writes (op, row, nth) VALUES (?, ?, ?)",
+                                    (op, json.dumps(row), nth))
+        return cur.lastrowid
+
+    def pending(self):
+        """
+        Returns every unflushed write as (seq, op, row, nth), oldest first. For a
+        deletion, nth says which of the rows with that title, author and date it
+        removes, counting from 1 in sheet order.
+        """
+        cur = self.conn.execute("SELECT seq, op, row, nth FROM pending_writes ORDER BY seq")
+        return [(seq, op, json.loads(row), nth) for seq, op, row, nth in cur]
+
+    def ack(self, seqs):
+        """Forgets writes that have reached the backend."""
+        with self.conn:
+            self.conn.executemany("DELETE FROM pending_writes WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM pending_writes").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class _RowLocator:
+    """Finds rows by identity (title, author, date) in one pass instead of a scan per deletion."""
+
+    def __init__(self, rows):
+        self.positions = {}
+        for position, row in enumerate(rows):
+            if row and not is_header_row(row):
+                self.positions.setdefault(row_identity(row), []).append(position)
+
+    def add(self, row, position):
+        self.positions.setdefault(row_identity(row), []).append(position)
+
+    def count(self, row):
+        return len(self.positions.get(row_identity(row), ()))
+
+    def take(self, row, nth=1):
+        """Returns (and forgets) the position of the nth row matching `row`, or None if there are fewer."""
+        found = self.positions.get(row_identity(row))
+        return found.pop(nth - 1) if found and len(found) >= nth else None
+
+
+def apply_writes(rows, writes):
+    """
+    Returns the rows with pending writes applied on top: appends go to the end,
+    deletes remove the nth row with the same identity. Used to overlay unflushed
+    local edits on rows freshly read from the backend or the cache.
+    """
+    if not writes:
+        return rows
+    rows = list(rows)
+    locator = _RowLocator(rows)
+    for _, op, row, nth in writes:
+        if op == APPEND:
+            locator.add(row, len(rows))
+            rows.append(row)
+        elif op == DELETE:
+            position = locator.take(row, nth)
+            if position is not None:
+                rows[position] = None
+    return [row for row in rows if row is not None]
+
+
+def flush_deletions(storage, confirmed_rows, confirmed_revision, writes):
+    """
+    Runs on the worker thread. First half of a flush: sends every pending deletion
+    in (at most) one delete_rows() request. Returns (rows, revision, seqs, appends):
+    the backend's rows and revision afterwards, the journal entries that are done
+    with, and the (seq, row) appends still to be sent by flush_appends().
+
+    confirmed_rows is the last known copy of the backend's rows (the cache). If the
+    backend has been changed by someone else since confirmed_revision, it is re-read
+    first so deletions are matched against the current row numbers.
+    """
+    revision = storage.get_revision()
+    if confirmed_revision is None or revision != confirmed_revision:
+        confirmed_rows = storage.get_all_rows()
+
+    # Replay the writes on a scratch copy: None marks a deleted backend row,
+    # and appends that get deleted again before reaching the backend cancel out.
+    scratch = list(confirmed_rows)
+    existing = _RowLocator(scratch)
+    appends = []
+    new_rows = _RowLocator([])
+    for seq, op, row, nth in writes:
+        if op == APPEND:
+            new_rows.add(row, len(appends))
+            appends.append((seq, row))
+        elif op == DELETE:
+            # Duplicates are counted in sheet order, so the ones still to be appended come last
+            on_backend = existing.count(row)
+            if nth > on_backend:
+                position = new_rows.take(row, nth - on_backend)
+                if position is not None:
+                    appends[position] = None
+                continue
+            position = existing.take(row, nth)
+            scratch[position] = None
+    appends = [append for append in appends if append is not None]
+
+    doomed = [position + 1 for position, row in enumerate(scratch) if row is None]
+    if doomed:
+        storage.delete_rows(doomed)
+        revision = storage.get_revision()
+    # Everything but the appends still to send: deletions, and appends a deletion cancelled
+    to_send = {seq for seq, _ in appends}
+    done = [seq for seq, *_ in writes if seq not in to_send]
+    return [row for row in scratch if row is not None], revision, done, appends
+
+
+def flush_appends(storage, rows, appends):
+    """
+    Runs on the worker thread. Second half of a flush: sends the appends left by
+    flush_deletions() in one append_rows() request. Returns (rows, revision, seqs).
+    """
+    storage.append_rows([row for _, row in appends])
+    return rows + [row for _, row in appends], storage.get_revision(), [seq for seq, _ in appends]
+
+
+def flush_writes(storage, confirmed_rows, confirmed_revision, writes):
+    """
+    Both halves of a flush in one go, for callers that don't need the deletions
+    acknowledged separately. Returns (rows, revision, seqs) like flush_appends().
+    """
+    rows, revision, done, appends = flush_deletions(storage, confirmed_rows, confirmed_revision, writes)
+    if not appends:
+        return rows, revision, done
+    rows, revision, sent = flush_appends(storage, rows, appends)
+    return rows, revision, done + sent
+
+
+class WriteBehindQueue:
+    """
+    Tk-side coordinator: records writes in the journal, schedules batched flushes
+    on the SheetsWorker and backs off when the backend is rate limiting us.
+    on_flushed(rows, revision) is called with the backend's state after each flush;
+    on_status(pending_count, error) whenever the number of pending writes changes.
+    """
+
+    def __init__(self, root, worker, journal, storage, confirmed_state, on_flushed, on_status=None):
+        self.root = root
+        self.worker = worker
+        self.journal = journal
+        self.storage = storage
+        self.confirmed_state = confirmed_state  # () -> (rows, revision) from the cache
+        self.on_flushed = on_flushed
+        self.on_status = on_status
+        self.backoff_ms = MIN_BACKOFF_MS
+        self._flush_id = None
+        self._in_flight = False
+
+    def pending(self):
+        return self.journal.pending()
+
+    def append(self, row):
+        self.journal.add(APPEND, row)
+        self._changed()
+
+    def delete(self, row, nth=1):
+        """Deletes the nth row (in sheet order) with the row's title, author and date."""
+        self.journal.add(DELETE, row, nth)
+        self._changed()
+
+    def _changed(self):
+        self._report(None)
+        self.schedule_flush(FLUSH_DELAY_MS)
+
+    def schedule_flush(self, delay_ms=0):
+        """Flushes after delay_ms, unless a flush is already scheduled or running."""
+        if self.storage is None or self._flush_id is not None or self._in_flight:
+            return
+        self._flush_id = self.root.after(delay_ms, self._flush)
+
+    def _flush(self):
+        self._flush_id = None
+        writes = self.journal.pending()
+        if not writes:
+            return
+        rows, revision = self.confirmed_state()
+        self._in_flight = True
+        self.worker.submit(flush_deletions, self.storage, rows, revision, writes,
+                           on_success=self._deletions_flushed, on_error=self._failed, key="flush",
+                           label=f"Saving {len(writes)} change(s)")
+
+    def _deletions_flushed(self, result):
+        rows, revision, seqs, appends = result
+        # Acknowledged now: if the appends fail, the retry must not delete these rows again
+        self.journal.ack(seqs)
+        if not appends:
+            self._flushed((rows, revision, []))
+            return
+        self.on_flushed(rows, revision)
+        self.worker.submit(flush_appends, self.storage, rows, appends,
+                           on_success=self._flushed, on_error=self._failed, key="flush",
+                           label=f"Saving {len(appends)} new recipe(s)")
+
+    def _flushed(self, result):
+        self._in_flight = False
+        rows, revision, seqs = result
+        self.journal.ack(seqs)
+        self.backoff_ms = MIN_BACKOFF_MS
+        self.on_flushed(rows, revision)
+        self._report(None)
+        if len(self.journal):
+            self.schedule_flush(FLUSH_DELAY_MS)  # More edits arrived while this batch was in flight
+
+    def _failed(self, error):
+        self._in_flight = False
+        # Whatever wasn't acknowledged stays in the journal for the retry
+        self._report(error)
+        delay = self.backoff_ms if isinstance(error, RateLimitError) else max(self.backoff_ms, 5000)
+        self.backoff_ms = min(self.backoff_ms * 2, MAX_BACKOFF_MS)
+        self.schedule_flush(int(delay * random.uniform(1.0, 1.5)))
+
+    def _report(self, error):
+        if self.on_status is not None:
+            self.on_status(len(self.journal), error)